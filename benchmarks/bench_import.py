@@ -0,0 +1,46 @@
+"""Cold start time of tpsx: import and first cleaned text in a fresh interpreter
+
+Usage: python benchmarks/bench_import.py [runs] [max import ms]
+Exits with 1 if the median import time is over max import ms or if
+importing tpsx loads nltk or numpy
+"""
+import sys
+import json
+import statistics
+import subprocess
+
+PROBE = '''
+import sys, time, json
+start = time.perf_counter()
+import tpsx
+imported = time.perf_counter()
+eager = [module for module in ('nltk', 'numpy') if module in sys.modules]
+cleaner = tpsx.TextCleaner(tpsx.ENGLISH, fast_tokenizer=True)
+created = time.perf_counter()
+cleaner.warm_up()
+warmed = time.perf_counter()
+print(json.dumps({'import': imported - start, 'cleaner': created - imported,
+                  'warm_up': warmed - created, 'eager': eager}))
+'''
+
+
+def probe():
+    output = subprocess.run([sys.executable, '-c', PROBE], check=True, stdout=subprocess.PIPE, text=True).stdout
+    return json.loads(output)
+
+
+if __name__ == '__main__':
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    max_import_ms = float(sys.argv[2]) if len(sys.argv) > 2 else None
+
+    samples = [probe() for _ in range(runs)]
+    for stage in ('import', 'cleaner', 'warm_up'):
+        print(f"{stage}: median {statistics.median(s[stage] for s in samples) * 1000:.1f} ms")
+
+    eager = samples[0]['eager']
+    if eager:
+        print(f"import tpsx loaded: {', '.join(eager)}")
+
+    import_ms = statistics.median(s['import'] for s in samples) * 1000
+    if eager or max_import_ms is not None and import_ms > max_import_ms:
+        sys.exit(1)
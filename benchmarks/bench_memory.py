@@ -0,0 +1,65 @@
+"""Memory used by a model for every relation
+
+Usage: python benchmarks/bench_memory.py [words] [topics] [relations per word]
+"""
+import os
+import sys
+import random
+import tempfile
+import tracemalloc
+from tpsx import TopicsExtractor, TrainingCounts, ENGLISH
+from tpsx.snapshot import build_postings
+
+
+def make_counts(words_num, topics_num, relations_per_word, seed=0):
+    rng = random.Random(seed)
+    topics = [f'topic{index}' for index in range(topics_num)]
+    counts = TrainingCounts()
+    counts.topics = list(topics)
+    for index in range(words_num):
+        word = f'word{index}'
+        for topic in rng.sample(topics, relations_per_word):
+            count = rng.randint(1, 20)
+            counts.relation_counts[(word, topic)] += count
+            counts.word_counts[word] += count
+    return counts
+
+
+def traced(function):
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    result = function()
+    size = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    return result, size
+
+
+if __name__ == '__main__':
+    words_num = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    topics_num = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    relations_per_word = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+
+    counts = make_counts(words_num, topics_num, relations_per_word)
+    relations_num = len(counts.relation_counts)
+
+    def build():
+        extractor = TopicsExtractor(ENGLISH)
+        extractor._apply_counts(counts)
+        return extractor
+
+    extractor, model_size = traced(build)
+    _, postings_size = traced(lambda: build_postings(extractor._relations))
+    print(f'relations: {relations_num}')
+    print(f'objects: {(model_size - postings_size) / relations_num:.1f} bytes/relation')
+    print(f'posting index: {postings_size / relations_num:.1f} bytes/relation')
+
+    try:
+        _, compiled_size = traced(extractor.compile)
+        print(f'compiled model: {compiled_size / relations_num:.1f} bytes/relation')
+    except ImportError:
+        pass
+
+    with tempfile.TemporaryDirectory() as directory:
+        extractor.save(directory, 'model.tpsx')
+        file_size = os.path.getsize(os.path.join(directory, 'model.tpsx'))
+        print(f'model file: {file_size / relations_num:.1f} bytes/relation')
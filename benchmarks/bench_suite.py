@@ -0,0 +1,187 @@
+"""Benchmarks of the hot paths of tpsx on synthetic corpora, with a json report
+
+Usage: python benchmarks/bench_suite.py [--vocabulary N] [--topics N] [--documents N]
+                                        [--length N] [--scales 1,2,4] [--fast-tokenizer]
+                                        [--no-memory] [--output report.json]
+
+Every stage reports the number of operations, the throughput, the latency
+percentiles in milliseconds and the peak traced memory. The vocabulary and
+the topics are multiplied by every scale to get the scaling curves.
+"""
+import os
+import sys
+import time
+import json
+import random
+import platform
+import argparse
+import tempfile
+import tracemalloc
+from tpsx import TopicsExtractor, MappedModel, ENGLISH
+
+LETTERS = 'bcdfghlmnprstvz'
+VOWELS = 'aeiou'
+
+
+def make_vocabulary(size, seed=0):
+    # Pronounceable made up words, different stems for the snowball stemmer
+    rng = random.Random(seed)
+    words = set()
+    while len(words) < size:
+        syllables = rng.randint(2, 4)
+        words.add(''.join(rng.choice(LETTERS) + rng.choice(VOWELS) for _ in range(syllables)))
+    return sorted(words)
+
+
+def make_corpus(vocabulary, topics_num, documents_num, document_length, seed=0):
+    """Labelled documents, every topic prefers a slice of the vocabulary
+
+    :return: list of (topics, text)
+    """
+    rng = random.Random(seed)
+    topics = [f'topic{index}' for index in range(topics_num)]
+    # Zipf like frequencies of the words
+    frequencies = [1 / rank for rank in range(1, len(vocabulary) + 1)]
+    slice_size = max(len(vocabulary) // topics_num, 1)
+
+    corpus = []
+    for _ in range(documents_num):
+        labels = rng.sample(topics, min(rng.randint(1, 2), topics_num))
+        preferred = topics.index(labels[0]) * slice_size
+        words = []
+        for index in range(document_length):
+            if rng.random() < 0.5:
+                words.append(vocabulary[(preferred + rng.randrange(slice_size)) % len(vocabulary)])
+            else:
+                words.append(rng.choices(vocabulary, frequencies)[0])
+            if index % 12 == 11:
+                words[-1] += '.'
+        corpus.append((labels if len(labels) > 1 else labels[0], ' '.join(words)))
+    return corpus
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(int(share * len(values)), len(values) - 1)]
+
+
+def measure(operation, tasks, memory=True):
+    """Run an operation on every task
+
+    :param operation: callable of a task
+    :param tasks: list
+    :param memory: bool
+        If true the tasks run a second time with tracemalloc for the peak memory
+    :return: dict
+    """
+    latencies = []
+    start = time.perf_counter()
+    for task in tasks:
+        task_start = time.perf_counter()
+        operation(task)
+        latencies.append(time.perf_counter() - task_start)
+    elapsed = time.perf_counter() - start
+
+    stats = {'operations': len(tasks),
+             'seconds': elapsed,
+             'throughput': len(tasks) / elapsed if elapsed else None,
+             'latency_ms': {'p50': percentile(latencies, 0.5) * 1000,
+                            'p90': percentile(latencies, 0.9) * 1000,
+                            'p99': percentile(latencies, 0.99) * 1000,
+                            'max': max(latencies) * 1000}}
+
+    if memory:
+        tracemalloc.start()
+        for task in tasks:
+            operation(task)
+        stats['peak_memory_bytes'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return stats
+
+
+def run_scale(corpus, fast_tokenizer, memory):
+    stages = {}
+    texts = [text for _, text in corpus]
+
+    cleaner = TopicsExtractor(ENGLISH, fast_tokenizer=fast_tokenizer).cleaner.warm_up()
+    stages['clean_text'] = measure(cleaner.clean_text, texts, memory)
+
+    def train(example):
+        extractor.train(*example)
+
+    extractor = TopicsExtractor(ENGLISH, fast_tokenizer=fast_tokenizer)
+    stages['train'] = measure(train, corpus, False)
+    if memory:
+        extractor = TopicsExtractor(ENGLISH, fast_tokenizer=fast_tokenizer)
+        stages['train']['peak_memory_bytes'] = measure(train, corpus, True)['peak_memory_bytes']
+
+    def train_many(_):
+        TopicsExtractor(ENGLISH, fast_tokenizer=fast_tokenizer).train_many(corpus)
+
+    stages['train_many'] = measure(train_many, [None], memory)
+    stages['train_many']['throughput'] = len(corpus) / stages['train_many']['seconds']
+
+    stages['predict'] = measure(extractor.predict, texts, memory)
+    stages['predict_top3'] = measure(lambda text: extractor.predict(text, top_k=3, details=False), texts, memory)
+
+    # Every pair of trained topics related, one call for each pair, a topic
+    # not sampled by any document is not in the model
+    topics = [topic.label for topic in extractor.topics]
+    pairs = [(topic1, topic2) for index, topic1 in enumerate(topics) for topic2 in topics[index + 1:]]
+    stages['add_related_topic'] = measure(lambda pair: extractor.add_related_topic(*pair, False), pairs, memory)
+
+    with tempfile.TemporaryDirectory() as directory:
+        for file_format in ('tpsx', 'pickle'):
+            filename = f'model.{file_format}'
+            file_path = os.path.join(directory, filename)
+            stages[f'save_{file_format}'] = measure(lambda _: extractor.save(directory, filename), [None], memory)
+            stages[f'save_{file_format}']['file_bytes'] = os.path.getsize(file_path)
+            stages[f'load_{file_format}'] = measure(lambda _: TopicsExtractor.load(file_path), [None], memory)
+            if file_format == 'tpsx':
+                stages['load_mapped'] = measure(lambda _: MappedModel(file_path).close(), [None], memory)
+
+    model = {'words': len(extractor.words), 'topics': len(extractor.topics),
+             'relations': len(extractor.relations), 'related_topics': len(extractor.related_topics)}
+    return model, stages
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--vocabulary', type=int, default=2000, help='words of the vocabulary at scale 1')
+    parser.add_argument('--topics', type=int, default=20, help='topics at scale 1')
+    parser.add_argument('--documents', type=int, default=500, help='documents of the corpus')
+    parser.add_argument('--length', type=int, default=60, help='words of a document')
+    parser.add_argument('--scales', default='1', help='comma separated multipliers of vocabulary and topics')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--fast-tokenizer', action='store_true')
+    parser.add_argument('--no-memory', action='store_true', help='skip the traced runs of the peak memory')
+    parser.add_argument('--output', help='file of the json report, the default is the standard output')
+    options = parser.parse_args(arguments)
+
+    report = {'config': vars(options),
+              'environment': {'python': platform.python_version(),
+                              'implementation': platform.python_implementation(),
+                              'platform': platform.platform(),
+                              'cpus': os.cpu_count()},
+              'results': []}
+
+    for scale in (int(value) for value in options.scales.split(',')):
+        vocabulary = make_vocabulary(options.vocabulary * scale, options.seed)
+        topics_num = options.topics * scale
+        corpus = make_corpus(vocabulary, topics_num, options.documents, options.length, options.seed)
+        model, stages = run_scale(corpus, options.fast_tokenizer, not options.no_memory)
+        report['results'].append({'scale': scale, 'vocabulary': len(vocabulary), 'model': model, 'stages': stages})
+        print(f'scale {scale}: ' + ', '.join(f"{name} {stats['throughput']:.0f}/s"
+                                              for name, stats in stages.items()), file=sys.stderr)
+
+    output = json.dumps(report, indent=2)
+    if options.output:
+        with open(options.output, 'w') as file:
+            file.write(output)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
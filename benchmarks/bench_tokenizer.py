@@ -0,0 +1,45 @@
+"""Throughput of TextCleaner.clean_text with the nltk and the fast tokenizer
+
+Usage: python benchmarks/bench_tokenizer.py [documents] [words per document]
+"""
+import sys
+import random
+import time
+from tpsx import TextCleaner, ENGLISH
+
+WORDS = ('the quick brown fox jumps over a lazy dog while people walk, talk and read '
+         'books about history science music and cooking in the early morning').split(' ')
+
+
+def make_documents(documents_num, document_length, seed=0):
+    rng = random.Random(seed)
+    documents = []
+    for _ in range(documents_num):
+        words = [rng.choice(WORDS) for _ in range(document_length)]
+        for index in range(8, document_length, 9):
+            words[index] += rng.choice('.!?')
+        documents.append(' '.join(words))
+    return documents
+
+
+def run(cleaner, documents):
+    start = time.perf_counter()
+    tokens = 0
+    for document in documents:
+        for sentence in cleaner.clean_text(document):
+            tokens += len(sentence)
+    elapsed = time.perf_counter() - start
+    return len(documents) / elapsed, tokens / elapsed
+
+
+if __name__ == '__main__':
+    documents_num = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    document_length = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+    documents = make_documents(documents_num, document_length)
+
+    for fast_tokenizer in (False, True):
+        cleaner = TextCleaner(ENGLISH, fast_tokenizer=fast_tokenizer)
+        cleaner.clean_text(documents[0])
+        docs_per_second, tokens_per_second = run(cleaner, documents)
+        print(f"{'fast' if fast_tokenizer else 'nltk'}: "
+              f"{docs_per_second:.0f} documents/s, {tokens_per_second:.0f} stems/s")
@@ -0,0 +1,57 @@
+"""Latency of TopicsExtractor.update and add_word as the vocabulary grows
+
+Usage: python benchmarks/bench_update.py [updates] [vocabulary sizes, comma separated]
+
+A publish copies only the posting buckets of the changed words, so the
+latency must stay flat while the vocabulary grows
+"""
+import sys
+import random
+import time
+from tpsx import TopicsExtractor, TrainingCounts, ENGLISH
+
+TOPICS = [f'topic{index}' for index in range(20)]
+
+
+def make_model(words_num, seed=0):
+    rng = random.Random(seed)
+    counts = TrainingCounts()
+    counts.topics = list(TOPICS)
+    for index in range(words_num):
+        word = f'word{index}'
+        for topic in rng.sample(TOPICS, 3):
+            counts.relation_counts[(word, topic)] += 1
+            counts.word_counts[word] += 1
+
+    extractor = TopicsExtractor(ENGLISH)
+    extractor._apply_counts(counts)
+    return extractor
+
+
+def median_ms(function, runs):
+    latencies = []
+    for run in range(runs):
+        start = time.perf_counter()
+        function(run)
+        latencies.append(time.perf_counter() - start)
+    return sorted(latencies)[len(latencies) // 2] * 1000
+
+
+if __name__ == '__main__':
+    updates = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    sizes = [int(size) for size in sys.argv[2].split(',')] if len(sys.argv) > 2 else [1000, 10000, 100000, 400000]
+
+    for words_num in sizes:
+        extractor = make_model(words_num)
+        rng = random.Random(1)
+
+        def update(_):
+            # Stems already cleaned, the nltk pipeline is not measured
+            stems = [f'word{rng.randrange(words_num)}' for _ in range(20)]
+            extractor.update(rng.choice(TOPICS), [stems], decay=0.99)
+
+        def add_word(run):
+            extractor.add_word(f'new{run}', rng.choice(TOPICS))
+
+        print(f'{words_num} words: update {median_ms(update, updates):.3f} ms, '
+              f'add_word {median_ms(add_word, updates):.3f} ms')
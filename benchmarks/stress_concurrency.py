@@ -0,0 +1,76 @@
+"""Stress test of predictions running while the model is trained by another thread
+
+Usage: python benchmarks/stress_concurrency.py [seconds] [reader threads]
+
+Readers check that every prediction comes from a consistent model: the
+weights of a word over its topics always sum to 1. Exits with 1 on any
+error or inconsistent prediction.
+"""
+import sys
+import time
+import random
+import threading
+from tpsx import TopicsExtractor, ENGLISH
+
+TOPICS = [f'topic{index}' for index in range(20)]
+WORDS = [f'word{index}' for index in range(500)]
+
+
+def trainer(extractor, stop, errors):
+    rng = random.Random(1)
+    try:
+        while not stop.is_set():
+            text = ' '.join(rng.choice(WORDS) for _ in range(30))
+            action = rng.random()
+            if action < 0.6:
+                extractor.update(rng.sample(TOPICS, 2), text, decay=0.99)
+            elif action < 0.9:
+                extractor.train(rng.choice(TOPICS), text)
+            else:
+                topic1, topic2 = rng.sample(TOPICS, 2)
+                extractor.add_related_topic(topic1, topic2, rng.random() < 0.5, rng.random() < 0.5)
+    except Exception as error:
+        errors.append(error)
+        stop.set()
+
+
+def reader(extractor, stop, errors, counter):
+    rng = random.Random()
+    try:
+        while not stop.is_set():
+            word = rng.choice(WORDS)
+            results = extractor.predict(word, merge_topics=False)
+            if results and abs(sum(result.score for result in results) - 1) > 1e-9:
+                raise AssertionError(f'Inconsistent weights for {word}')
+            extractor.predict(' '.join(rng.choice(WORDS) for _ in range(20)))
+            counter[0] += 1
+    except Exception as error:
+        errors.append(error)
+        stop.set()
+
+
+if __name__ == '__main__':
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+    readers_num = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+
+    extractor = TopicsExtractor(ENGLISH, fast_tokenizer=True)
+    extractor.train(TOPICS[0], ' '.join(WORDS))
+    extractor.set_update_window(200)
+
+    stop = threading.Event()
+    errors = []
+    counters = [[0] for _ in range(readers_num)]
+    threads = [threading.Thread(target=trainer, args=(extractor, stop, errors))]
+    threads += [threading.Thread(target=reader, args=(extractor, stop, errors, counter)) for counter in counters]
+
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    print(f'predictions: {sum(counter[0] for counter in counters)}, relations: {len(extractor.relations)}')
+    if errors:
+        print(f'failed: {errors[0]!r}')
+        sys.exit(1)
@@ -0,0 +1,40 @@
+import os
+import tempfile
+from multiprocessing import Pool
+
+from tpsx import *
+
+corpus = [('animali', 'Il cane e il gatto dormono. La giraffa mangia le foglie.'),
+          ('felini', 'Il gatto caccia il topo. La lince vive nei boschi.'),
+          (['animali', 'pesci'], 'Lo squalo nuota veloce. Le pinne del pesce.'),
+          ('volatili', 'Il pettirosso vola sul ramo. Le piume del rapace.'),
+          ('pesci', 'Le branchie e le squame del pesce rosso.'),
+          (['felini', 'animali'], 'Il leone dorme nella savana.')]
+
+
+def count_shard(task):
+    # Every shard can be counted by another process or machine
+    shard, file_path = task
+    TopicsExtractor(ITALIAN).count_corpus(shard).save(file_path)
+    return file_path
+
+
+if __name__ == '__main__':
+    shards = [corpus[0:2], corpus[2:4], corpus[4:6]]
+
+    with tempfile.TemporaryDirectory() as directory:
+        tasks = [(shard, os.path.join(directory, f'shard{index}.tpsxc')) for index, shard in enumerate(shards)]
+        with Pool(len(shards)) as pool:
+            files = pool.map(count_shard, tasks)
+
+        sharded = TopicsExtractor(ITALIAN)
+        sharded.train_counts([TrainingCounts.load(file_path) for file_path in files])
+
+    single = TopicsExtractor(ITALIAN)
+    single.train_many(corpus)
+
+    print('Same weights:', [(r.word.label, r.topic.label, r.weight) for r in sharded.relations] ==
+          [(r.word.label, r.topic.label, r.weight) for r in single.relations])
+
+    for result in sharded.predict('Il gatto mangia il pesce'):
+        result.show_data()
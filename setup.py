@@ -32,4 +32,5 @@ if __name__ == '__main__':
                      long_description=long_description,
                      setup_requires=['nltk >= 3'],
                      install_requires=['nltk >= 3'],
+                     extras_require={'numpy': ['numpy']},
                      **setup_infos)
@@ -1,2 +1,5 @@
-from .clean import TextCleaner
+from .clean import TextCleaner, StemCache
+from .compiled import CompiledModel
+from .corpus_cache import CleanedCorpusCache
+from .stats import PipelineStats
 from .topics_extractor import *
@@ -1,6 +1,8 @@
-import nltk
-from nltk.corpus import stopwords
+import re
+import time
 import string
+import threading
+from collections import OrderedDict
 
 SUPPORTED_LANGUAGES = ['danish',
                        'dutch',
@@ -17,37 +19,321 @@ SUPPORTED_LANGUAGES = ['danish',
                        'spanish',
                        'swedish']
 
+# nltk is imported by the first TextCleaner that needs it, see _import_nltk
+nltk = None
+
+_PUNCTUATION_TABLE = str.maketrans(string.punctuation, ' ' * len(string.punctuation))
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+_TOKEN = re.compile(r'\w+')
+
+# Characters of an unfinished sentence kept by stem_stream before splitting it anyway
+_MAX_PENDING = 1 << 16
+
+
+def _import_nltk():
+    global nltk
+    if nltk is None:
+        import nltk as nltk_module
+        nltk = nltk_module
+    return nltk
+
+
+def _fast_sent_tokenize(text):
+    # Without the empty pieces of a text starting or ending with spaces
+    return [sentence for sentence in _SENTENCE_END.split(text.strip()) if sentence]
+
+
+class StemCache:
+    """
+    This class is used to memoize the stems of the tokens
+    with a bounded least recently used eviction
+
+    A cache can be shared by many TextCleaner of the same language
+
+    Variables
+    ----------
+    maxsize: int
+        Maximum number of stored stems
+    language: str
+        Language of the cleaners using the cache
+    lemmatize: bool
+        Lemmatization setting of the cleaners using the cache
+    hits: int
+        Number of stems found in the cache
+    misses: int
+        Number of stems computed by the stemmer
+    """
+    # Default of the caches pickled without it
+    lemmatize = None
+
+    def __init__(self, maxsize=100000):
+        """
+        :param maxsize: int
+        """
+        self.maxsize = maxsize
+        self.language = None
+        self.lemmatize = None
+        self.hits = 0
+        self.misses = 0
+        self._stems = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_stems'] = OrderedDict()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._stems)
+
+    def stem(self, token, stemmer):
+        """Get the stem of a token, computing it with the stemmer if missing
+
+        :param token: str
+        :param stemmer: callable
+        :return: str
+        """
+        with self._lock:
+            stem = self._stems.get(token)
+            if stem is not None:
+                self.hits += 1
+                self._stems.move_to_end(token)
+                return stem
+            self.misses += 1
+
+        stem = stemmer(token)
+
+        with self._lock:
+            self._stems[token] = stem
+            if len(self._stems) > self.maxsize:
+                self._stems.popitem(last=False)
+
+        return stem
+
+    def info(self):
+        """Get the cache statistics
+
+        :return: dict
+        """
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._stems),
+                'maxsize': self.maxsize}
+
+    def clear(self):
+        with self._lock:
+            self._stems.clear()
+            self.hits = 0
+            self.misses = 0
+
 
 class TextCleaner:
+    """
+    This class is used to split a text in sentences of stems
+
+    The nltk resources are loaded on the first cleaned text,
+    use warm_up to load them in advance
+    """
+    stem_cache = None
+    fast_tokenizer = False
+    lemmatize = False
+    stats = None
+
+    # Attributes holding nltk objects, they are never pickled
+    _RESOURCES = ('_stemmer', '_lemmatizer', '_stem', '_stop_words', '_stop_stems')
 
-    def __init__(self, language):
+    def __init__(self, language, stem_cache=None, cache_size=100000, fast_tokenizer=False, lemmatize=False,
+                 stats=None):
+        """
+        :param language: str
+        :param stem_cache: StemCache
+            A cache shared with other cleaners, if None a new one is created
+        :param cache_size: int
+            Size of the new cache, 0 disables the cache
+        :param fast_tokenizer: bool
+            If true the text is split with regular expressions
+            instead of the nltk punkt and word tokenizers
+        :param lemmatize: bool
+            If true the tokens are lemmatized with wordnet before the stemming,
+            the cleaners sharing a StemCache must use the same value
+        :param stats: PipelineStats
+            If given the stages of the cleaning are timed and counted,
+            the stats are not pickled
+        """
         if language not in SUPPORTED_LANGUAGES:
             raise AttributeError('Language {} is not supported'.format(language))
 
+        if stem_cache is None and cache_size:
+            stem_cache = StemCache(cache_size)
+
+        if stem_cache is not None:
+            if stem_cache.language is None:
+                stem_cache.language = language
+            elif stem_cache.language != language:
+                raise AttributeError('StemCache is used by the language {}'.format(stem_cache.language))
+
+            if stem_cache.lemmatize is None:
+                stem_cache.lemmatize = lemmatize
+            elif stem_cache.lemmatize != lemmatize:
+                raise AttributeError('StemCache is used with lemmatize={}'.format(stem_cache.lemmatize))
+
         self.language = language
-        self._stemmer = nltk.SnowballStemmer(language)
-        self._stop_words = stopwords.words(language)
-        self._lemmatizer = nltk.WordNetLemmatizer()
+        self.stem_cache = stem_cache
+        self.fast_tokenizer = fast_tokenizer
+        self.lemmatize = lemmatize
+        self.stats = stats
+        self._unload()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for name in self._RESOURCES:
+            state.pop(name, None)
+        state.pop('stats', None)
+        return state
+
+    def __setstate__(self, state):
+        for name in self._RESOURCES:
+            state.pop(name, None)
+        self.__dict__.update(state)
+        self._unload()
+
+    def _unload(self):
+        for name in self._RESOURCES:
+            setattr(self, name, None)
+
+    def warm_up(self):
+        """Load the nltk stemmer, stop words and tokenizers used by the cleaner
+
+        :return: TextCleaner
+        """
+        nltk = _import_nltk()
+        from nltk.corpus import stopwords
+
+        stemmer = nltk.SnowballStemmer(self.language)
+
+        if self.lemmatize:
+            self._lemmatizer = nltk.WordNetLemmatizer()
+            lemmatize = self._lemmatizer.lemmatize
+            self._stem = lambda token: stemmer.stem(lemmatize(token))
+        else:
+            self._stem = stemmer.stem
+
+        self._stop_words = frozenset(stopwords.words(self.language))
+        # Stemmed forms of the stop words, e.g. 'della' -> 'dell'
+        self._stop_stems = self._stop_words.union(stemmer.stem(word) for word in self._stop_words)
+        self._stemmer = stemmer
+
+        if not self.fast_tokenizer:
+            nltk.word_tokenize(nltk.sent_tokenize('Warm up.')[0])
+
+        return self
+
+    def _split_sentences(self, text):
+        if self.stats is not None:
+            start = time.perf_counter()
+            sentences = _fast_sent_tokenize(text) if self.fast_tokenizer else nltk.sent_tokenize(text)
+            self.stats.record('split_sentences', time.perf_counter() - start, sentences=len(sentences))
+            return sentences
+
+        if self.fast_tokenizer:
+            return _fast_sent_tokenize(text)
+        return nltk.sent_tokenize(text)
 
     def stem_text(self, text):
-        sentences = nltk.sent_tokenize(text)
+        if self._stemmer is None:
+            self.warm_up()
+
         sentences_stems = []
-        for sentence in sentences:
+        for sentence in self._split_sentences(text):
             sentences_stems.append(self.stem_sentence(sentence))
 
         return sentences_stems
 
+    def stem_stream(self, chunks):
+        """Split a stream of text in sentences of stems
+
+        The chunks can break a text anywhere, only the last unfinished
+        sentence is kept in memory, a sentence longer than _MAX_PENDING
+        characters is split at a whitespace
+
+        :param chunks: iterable of str
+        :return: generator of list of str, the stems of every sentence
+        """
+        if self._stemmer is None:
+            self.warm_up()
+
+        pending = ''
+        for chunk in chunks:
+            if not isinstance(chunk, str):
+                raise ValueError('Invalid chunk must be a str')
+
+            pending += chunk
+            sentences = self._split_sentences(pending)
+            # The last sentence can go on in the next chunk, with its trailing spaces
+            last = sentences.pop() if sentences else ''
+            pending = pending[pending.rfind(last):] if last else ''
+            if len(pending) > _MAX_PENDING:
+                cut = pending.rfind(' ') + 1 or len(pending)
+                sentences.append(pending[:cut])
+                pending = pending[cut:]
+
+            for sentence in sentences:
+                yield self.stem_sentence(sentence)
+
+        for sentence in self._split_sentences(pending):
+            yield self.stem_sentence(sentence)
+
+    def _tokenize(self, sentence):
+        sentence = sentence.translate(_PUNCTUATION_TABLE)
+
+        if self.fast_tokenizer:
+            return _TOKEN.findall(sentence)
+        return nltk.word_tokenize(sentence)
+
     def stem_sentence(self, sentence):
-        sentence = sentence.translate(
-            sentence.maketrans(string.punctuation, ' '*len(string.punctuation))
-        )
+        if self._stemmer is None:
+            self.warm_up()
+
+        if self.stats is not None:
+            return self._profiled_stem_sentence(sentence)
+
+        return self._stem_tokens(self._tokenize(sentence))
+
+    def _profiled_stem_sentence(self, sentence):
+        start = time.perf_counter()
+        tokens = self._tokenize(sentence)
+        tokenized = time.perf_counter()
+        self.stats.record('tokenize', tokenized - start, tokens=len(tokens))
+
+        # Hits and misses of a shared cache can include the ones of other threads
+        hits = misses = 0
+        if self.stem_cache is not None:
+            hits, misses = self.stem_cache.hits, self.stem_cache.misses
+        stems = self._stem_tokens(tokens)
+        if self.stem_cache is not None:
+            hits, misses = self.stem_cache.hits - hits, self.stem_cache.misses - misses
+
+        self.stats.record('stem', time.perf_counter() - tokenized, stems=len(stems),
+                          cache_hits=hits, cache_misses=misses)
+        return stems
 
-        tokens = nltk.word_tokenize(sentence)
+    def _stem_tokens(self, tokens):
         stems = []
 
         for token in tokens:
-            stem = self._stemmer.stem(token)
-            if stem not in self._stop_words:
+            # Stop words are dropped before wasting a stemming
+            if token.lower() in self._stop_words:
+                continue
+            if self.stem_cache is not None:
+                stem = self.stem_cache.stem(token, self._stem)
+            else:
+                stem = self._stem(token)
+            if stem not in self._stop_stems:
                 stems.append(stem)
 
         return stems
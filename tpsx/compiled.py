@@ -0,0 +1,196 @@
+# numpy is imported by the first compiled model, see _import_numpy
+np = None
+
+
+def _import_numpy():
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError('numpy is required to compile a model')
+        np = numpy
+    return np
+
+
+def _index_array(values):
+    # Integer arrays keep their dtype, the views of a mapped file are not copied
+    if isinstance(values, np.ndarray) and values.dtype.kind in 'iu':
+        return values
+    return np.asarray(values, dtype=np.int64)
+
+
+class CompiledModel:
+    """
+    This class represents a read only, array based copy of a model
+    used to score many documents at once
+
+    Variables
+    ----------
+    topics: list
+        The Topic objects, the position of a topic is its index in the arrays
+    vocabulary: dict or MappedWords
+        Maps a word label to its row in the weight matrix with get
+    indptr: numpy.ndarray
+        Row pointers of the sparse word x topic weight matrix (CSR)
+    topic_indices: numpy.ndarray
+        Column (topic index) of every stored weight
+    weights: numpy.ndarray
+        The relation weights, the relations of a word keep their creation order
+    adjacency: numpy.ndarray
+        Signed topic x topic matrix, adjacency[t, r] is +1 if the topic r
+        coexists with t, -1 if it doesn't and 0 if they are not related
+    related: list
+        For every topic index a list of (coexist, topic index)
+    """
+
+    def __init__(self, topics, vocabulary, indptr, topic_indices, weights, related):
+        """
+        :param topics: list of Topic
+        :param vocabulary: dict
+        :param indptr: array like
+        :param topic_indices: array like
+        :param weights: array like
+        :param related: RelatedTopicsIndex
+        """
+        _import_numpy()
+
+        self.topics = topics
+        self.vocabulary = vocabulary
+        self.indptr = _index_array(indptr)
+        self.topic_indices = _index_array(topic_indices)
+        self.weights = np.asarray(weights, dtype=np.float64)
+
+        topic_labels = [topic.label for topic in topics]
+        self.related = related.indexed(topic_labels)
+        self.adjacency = related.adjacency(topic_labels)
+
+    @classmethod
+    def from_extractor(cls, extractor):
+        """Compile the current state of a TopicsExtractor
+
+        :param extractor: TopicsExtractor
+        :return: CompiledModel
+        """
+        return extractor.compile()
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        """Compile a ModelSnapshot
+
+        :param snapshot: ModelSnapshot
+        :return: CompiledModel
+        """
+        _import_numpy()
+
+        topics = list(snapshot.topics)
+        topics_index = {topic.label: index for index, topic in enumerate(topics)}
+
+        vocabulary = {}
+        indptr = [0]
+        topic_indices = []
+        weights = []
+        for word_label, (word_relations, word_weights) in snapshot.postings.items():
+            vocabulary[word_label] = len(vocabulary)
+            topic_indices.extend(topics_index[relation.topic.label] for relation in word_relations)
+            weights.extend(word_weights)
+            indptr.append(len(weights))
+
+        return cls(topics, vocabulary, indptr, topic_indices, weights, snapshot.related)
+
+    @classmethod
+    def from_file(cls, model_file):
+        """Compile a model saved in the binary format without loading its objects
+
+        Since version 3 of the format the arrays are views of the memory
+        mapped file, not copied, and the words are decoded when they are
+        looked up. The older files are decoded and the weights computed
+
+        :param model_file: str or ModelFile
+        :return: CompiledModel
+        """
+        from tpsx.model_file import ModelFile
+        from tpsx.snapshot import RelatedTopicsIndex
+        from tpsx.topics_extractor import Topic
+
+        np = _import_numpy()
+
+        if isinstance(model_file, str):
+            model_file = ModelFile(model_file)
+
+        header = model_file.header
+        topics = [Topic(label) for label in header['topics']]
+
+        if model_file.version >= 3:
+            vocabulary = model_file.words
+            indptr = model_file.array('relation_offsets')
+            weights = model_file.array('relation_weights')
+        else:
+            vocabulary = {word: index for index, word in enumerate(model_file.words)}
+            relation_words = model_file.array('relation_words')
+            indptr = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+            np.cumsum(np.bincount(relation_words, minlength=len(vocabulary)), out=indptr[1:])
+            weights = model_file.array('relation_counts') / model_file.array('word_counts')[relation_words]
+
+        return cls(topics, vocabulary, indptr, model_file.array('relation_topics'), weights,
+                   RelatedTopicsIndex(header['related_topics']))
+
+    def score(self, documents, merge_topics=True):
+        """Score a list of tokenized documents with one sparse product
+
+        :param documents: list of list of str
+        :param merge_topics: bool
+        :return: tuple of numpy.ndarray
+            (score, topic_score, related_words_num, first_match) each of
+            shape (documents, topics). first_match orders the topics of a
+            document by their first matched word, unmatched topics are -1
+        """
+        documents_num = len(documents)
+        topics_num = len(self.topics)
+
+        # Token ids of all the documents, unknown words are dropped
+        doc_ids = []
+        word_ids = []
+        for doc_index, tokens in enumerate(documents):
+            for token in tokens:
+                word_index = self.vocabulary.get(token)
+                if word_index is not None:
+                    doc_ids.append(doc_index)
+                    word_ids.append(word_index)
+
+        doc_ids = np.asarray(doc_ids, dtype=np.int64)
+        word_ids = np.asarray(word_ids, dtype=np.int64)
+
+        # Sparse document x word count vectors
+        _, first_position, counts = np.unique(doc_ids * len(self.vocabulary) + word_ids,
+                                              return_index=True, return_counts=True)
+        doc_ids = doc_ids[first_position]
+        word_ids = word_ids[first_position]
+
+        # Expand every (document, word) pair to the relations of the word,
+        # the offsets of a mapped file are unsigned
+        starts = self.indptr[word_ids].astype(np.int64, copy=False)
+        lengths = self.indptr[word_ids + 1].astype(np.int64, copy=False) - starts
+        total = int(lengths.sum())
+        offsets = np.arange(total) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        entries = np.repeat(starts, lengths) + offsets
+        cells = np.repeat(doc_ids, lengths) * topics_num + self.topic_indices[entries]
+        entry_counts = np.repeat(counts, lengths)
+
+        size = documents_num * topics_num
+        score = np.bincount(cells, weights=self.weights[entries] * entry_counts, minlength=size)
+        related_words_num = np.bincount(cells, weights=entry_counts, minlength=size)
+
+        # Order in which the topics would be met scanning the documents word by word
+        max_length = int(lengths.max()) if len(lengths) else 1
+        first_match = np.full(size, np.iinfo(np.int64).max, dtype=np.int64)
+        np.minimum.at(first_match, cells, np.repeat(first_position, lengths) * max_length + offsets)
+        first_match[related_words_num == 0] = -1
+
+        score = score.reshape(documents_num, topics_num)
+        topic_score = score + score @ self.adjacency.T if merge_topics else score.copy()
+
+        return (score,
+                topic_score,
+                related_words_num.reshape(documents_num, topics_num).astype(np.int64),
+                first_match.reshape(documents_num, topics_num))
@@ -0,0 +1,149 @@
+import os
+import json
+import mmap
+import struct
+import hashlib
+import threading
+
+# Key of a text, offset and length of its stems in the data file
+_RECORD = struct.Struct('<16sQI')
+
+INDEX_FILE = 'corpus.index'
+DATA_FILE = 'corpus.data'
+
+
+class CleanedCorpusCache:
+    """
+    This class is used to store on disk the cleaned texts of a corpus,
+    the sentences of stems given by TextCleaner.clean_text
+
+    A text is found by the hash of the text, the language and the cleaner
+    settings, so a cache can be shared by cleaners with other settings.
+    The stems are read from a memory mapped file, the nltk resources are
+    loaded only to clean the texts missing from the cache. Only one process
+    at a time can write a cache directory
+
+    Variables
+    ----------
+    directory: str
+    cleaner: TextCleaner
+    hits: int
+        Number of texts found in the cache
+    misses: int
+        Number of texts cleaned by the cleaner
+    """
+
+    def __init__(self, directory, cleaner):
+        """
+        :param directory: str
+            Created if missing
+        :param cleaner: TextCleaner
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.cleaner = cleaner
+        self.hits = 0
+        self.misses = 0
+        self._settings = json.dumps({'language': cleaner.language,
+                                     'fast_tokenizer': cleaner.fast_tokenizer,
+                                     'lemmatize': cleaner.lemmatize}, sort_keys=True).encode('utf-8')
+        self._lock = threading.Lock()
+        self._index = {}
+        self._mmap = None
+
+        data_path = os.path.join(directory, DATA_FILE)
+        self._data = open(data_path, 'ab')
+        data_size = self._data.tell()
+
+        index_path = os.path.join(directory, INDEX_FILE)
+        if os.path.exists(index_path):
+            with open(index_path, 'rb') as index_file:
+                index = index_file.read()
+            # A partial last record or data of an interrupted write are ignored
+            for key, offset, length in _RECORD.iter_unpack(index[:len(index) - len(index) % _RECORD.size]):
+                if offset + length <= data_size:
+                    self._index[key] = (offset, length)
+        self._index_file = open(index_path, 'ab')
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, text):
+        return self._key(text) in self._index
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _key(self, text):
+        return hashlib.blake2b(self._settings + b'\0' + text.encode('utf-8'), digest_size=16).digest()
+
+    def _read(self, offset, length):
+        if self._mmap is None or offset + length > len(self._mmap):
+            # Map again the data file, grown with the new texts
+            self._data.flush()
+            if self._mmap is not None:
+                self._mmap.close()
+            with open(os.path.join(self.directory, DATA_FILE), 'rb') as data_file:
+                self._mmap = mmap.mmap(data_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        data = self._mmap[offset:offset + length].decode('utf-8')
+        # Every sentence ends with a new line, its stems are separated by spaces
+        return [sentence.split() for sentence in data.split('\n')[:-1]]
+
+    def clean_text(self, text):
+        """Get the sentences of stems of a text, cleaning and storing it if missing
+
+        :param text: str
+        :return: list of list of str
+        """
+        key = self._key(text)
+
+        with self._lock:
+            location = self._index.get(key)
+            if location is not None:
+                self.hits += 1
+                # An empty file can't be mapped, a text without sentences has no data
+                return self._read(*location) if location[1] else []
+
+        sentences_stems = self.cleaner.clean_text(text)
+        data = ''.join(' '.join(sentence) + '\n' for sentence in sentences_stems).encode('utf-8')
+
+        with self._lock:
+            self.misses += 1
+            if key not in self._index:
+                offset = self._data.tell()
+                self._data.write(data)
+                self._data.flush()
+                self._index_file.write(_RECORD.pack(key, offset, len(data)))
+                self._index_file.flush()
+                self._index[key] = (offset, len(data))
+
+        return sentences_stems
+
+    def clean_corpus(self, corpus):
+        """Clean the examples of a labelled corpus with the cache
+
+        The output can be given to TopicsExtractor.train_many
+
+        :param corpus: iterable of (topics, examples)
+            examples is a str or a list of str
+        :return: generator of (topics, list of list of str)
+        """
+        for topics, examples in corpus:
+            if isinstance(examples, str):
+                examples = [examples]
+            sentences_stems = []
+            for example in examples:
+                sentences_stems.extend(self.clean_text(example))
+            yield topics, sentences_stems
+
+    def close(self):
+        with self._lock:
+            if self._mmap is not None:
+                self._mmap.close()
+                self._mmap = None
+            self._data.close()
+            self._index_file.close()
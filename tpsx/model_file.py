@@ -0,0 +1,383 @@
+import sys
+import json
+import mmap
+import zlib
+import struct
+from array import array
+
+MAGIC = b'TPSXMDL\0'
+# Version 1 stored the words joined by new lines, version 2 their offsets,
+# version 3 adds the word hash table, the relation offsets and the weights
+VERSION = 3
+
+# Files of the TrainingCounts, see write_counts
+COUNTS_MAGIC = b'TPSXCNT\0'
+COUNTS_VERSION = 2
+
+# magic, version, header length
+_PREAMBLE = struct.Struct('<8sII')
+_ALIGNMENT = 8
+
+# Typecode of every array section, all stored little endian
+SECTIONS = (('word_counts', 'd'),
+            ('relation_words', 'I'),
+            ('relation_topics', 'I'),
+            ('relation_counts', 'd'))
+
+# Sections of the models since version 3, read by the compiled models without copies:
+# the first relation of every word and one more, the relation weights and
+# the open addressing hash table of the words, word index + 1 or 0 if empty
+MODEL_SECTIONS = (('relation_offsets', 'Q'),
+                  ('relation_weights', 'd'),
+                  ('word_table', 'I'))
+
+# Byte offsets of the words in the utf-8 words section, one more than the words
+WORD_OFFSETS = ('word_offsets', 'Q')
+
+_DTYPES = {'d': '<f8', 'I': '<u4', 'Q': '<u8'}
+
+
+def _padding(size):
+    return -size % _ALIGNMENT
+
+
+def _to_bytes(values, typecode):
+    values = array(typecode, values)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values.tobytes()
+
+
+def _strings_blobs(strings, table=False):
+    # The words section and the word_offsets section of a list of strings,
+    # with the word_table section if table is true
+    encoded = [string.encode('utf-8') for string in strings]
+    offsets = [0]
+    for string in encoded:
+        offsets.append(offsets[-1] + len(string))
+    blobs = [('words', b''.join(encoded)), (WORD_OFFSETS[0], _to_bytes(offsets, WORD_OFFSETS[1]))]
+
+    if table:
+        # At most half full, a missing word is found after a few slots
+        slots = 1
+        while slots < 2 * len(encoded):
+            slots <<= 1
+        word_table = array('I', bytes(4 * slots))
+        mask = slots - 1
+        for index, string in enumerate(encoded):
+            slot = zlib.crc32(string) & mask
+            while word_table[slot]:
+                slot = (slot + 1) & mask
+            word_table[slot] = index + 1
+        blobs.append(('word_table', _to_bytes(word_table, 'I')))
+
+    return blobs
+
+
+def _section(buffer, header, name, typecode):
+    offset, size = header['sections'][name]
+    section = buffer[offset:offset + size].cast(typecode)
+    if sys.byteorder == 'big':
+        section = array(typecode, section)
+        section.byteswap()
+    return section
+
+
+class MappedWords:
+    """
+    This class represents the words of a file in the binary format,
+    a word is decoded from the file when it is accessed
+
+    The index of a word is its position, get finds the index of a word
+    with the hash table of the file
+    """
+
+    def __init__(self, words, offsets, table=None):
+        """
+        :param words: memoryview
+            The utf-8 words section
+        :param offsets: memoryview
+            Byte offsets of the words, one more than the words
+        :param table: memoryview
+            The word_table section, required by get
+        """
+        self._words = words
+        self._offsets = offsets
+        self._table = table
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('word index out of range')
+        return str(self._words[self._offsets[index]:self._offsets[index + 1]], 'utf-8')
+
+    def __iter__(self):
+        words = self._words
+        offsets = self._offsets
+        for index in range(len(self)):
+            yield str(words[offsets[index]:offsets[index + 1]], 'utf-8')
+
+    def __contains__(self, word_label):
+        return self.get(word_label) is not None
+
+    def get(self, word_label, default=None):
+        """Get the index of a word
+
+        :param word_label: str
+        :param default:
+            Returned if the word is not in the file
+        :return: int
+        """
+        table = self._table
+        if not table:
+            return default
+
+        encoded = word_label.encode('utf-8')
+        words = self._words
+        offsets = self._offsets
+        mask = len(table) - 1
+        slot = zlib.crc32(encoded) & mask
+        while True:
+            entry = table[slot]
+            if not entry:
+                return default
+            if words[offsets[entry - 1]:offsets[entry]] == encoded:
+                return entry - 1
+            slot = (slot + 1) & mask
+
+
+def _write_sections(file, magic, version, header, blobs):
+    # Section offsets depend on the header length, which depends on the offsets digits
+    header['sections'] = {}
+    header_size = 0
+    while True:
+        offset = _PREAMBLE.size + header_size + _padding(_PREAMBLE.size + header_size)
+        for name, blob in blobs:
+            header['sections'][name] = [offset, len(blob)]
+            offset += len(blob) + _padding(len(blob))
+        encoded_header = json.dumps(header).encode('utf-8')
+        if len(encoded_header) == header_size:
+            break
+        header_size = len(encoded_header)
+
+    file.write(_PREAMBLE.pack(magic, version, header_size))
+    file.write(encoded_header)
+    file.write(b'\0' * _padding(_PREAMBLE.size + header_size))
+    for name, blob in blobs:
+        file.write(blob)
+        file.write(b'\0' * _padding(len(blob)))
+
+
+def _read_sections(buffer, magic, version, file_path, kind):
+    # Get the json header of a file and the memoryviews of its sections
+    file_magic, file_version, header_size = _PREAMBLE.unpack_from(buffer)
+    if file_magic != magic:
+        raise ValueError(f'{file_path} is not a tpsx {kind} file')
+    if file_version > version:
+        raise ValueError(f'{kind.capitalize()} file version {file_version} is not supported, '
+                         f'max version is {version}')
+
+    header = json.loads(bytes(buffer[_PREAMBLE.size:_PREAMBLE.size + header_size]).decode('utf-8'))
+
+    buffer = memoryview(buffer)
+    offset, size = header['sections']['words']
+    words = buffer[offset:offset + size]
+
+    sections = {name: _section(buffer, header, name, typecode)
+                for name, typecode in SECTIONS + MODEL_SECTIONS if name in header['sections']}
+
+    if file_version < 2:
+        words = str(words, 'utf-8')
+        sections['words'] = words.split('\n') if header['words_num'] else []
+    else:
+        # The words are decoded on access
+        sections['words'] = MappedWords(words, _section(buffer, header, *WORD_OFFSETS),
+                                        sections.pop('word_table', None))
+
+    return file_version, header, sections
+
+
+def is_model_file(file_path):
+    """Check if a file starts with the header of the binary format
+
+    :param file_path: str
+    :return: bool
+    """
+    with open(file_path, 'rb') as file:
+        return file.read(len(MAGIC)) == MAGIC
+
+
+def write_model(extractor, file):
+    """Write a TopicsExtractor in the columnar binary format
+
+    The file holds a json header with the topics, the related topics and
+    the cleaner settings followed by the vocabulary strings and the
+    arrays of the word counts and of the relations (word index,
+    topic index, count, weight), relations are grouped by word. The word
+    hash table, the relation offsets and the weights let CompiledModel
+    use the mapped file without decoding or copying it
+
+    :param extractor: TopicsExtractor
+    :param file: binary file object
+    """
+    # Counts are stored with the value of an occurrence set back to 1
+    scale = extractor._update_scale
+    topics = [topic.label for topic in extractor.topics]
+    topics_index = {label: index for index, label in enumerate(topics)}
+
+    words = []
+    word_counts = []
+    relation_words = []
+    relation_topics = []
+    relation_counts = []
+    relation_offsets = [0]
+    relation_weights = []
+    for word_index, word in enumerate(extractor._words.values()):
+        words.append(word.label)
+        word_counts.append(word.count / scale)
+        for relation in extractor._relations.get(word.label, {}).values():
+            relation_words.append(word_index)
+            relation_topics.append(topics_index[relation.topic.label])
+            relation_counts.append(relation.word_count / scale)
+            relation_weights.append(relation.weight)
+        relation_offsets.append(len(relation_words))
+
+    blobs = [*_strings_blobs(words, table=True),
+             ('word_counts', _to_bytes(word_counts, 'd')),
+             ('relation_words', _to_bytes(relation_words, 'I')),
+             ('relation_topics', _to_bytes(relation_topics, 'I')),
+             ('relation_counts', _to_bytes(relation_counts, 'd')),
+             ('relation_offsets', _to_bytes(relation_offsets, 'Q')),
+             ('relation_weights', _to_bytes(relation_weights, 'd'))]
+
+    header = {'language': extractor.language,
+              'cleaner': {'fast_tokenizer': extractor.cleaner.fast_tokenizer,
+                          'lemmatize': extractor.cleaner.lemmatize},
+              'topics': topics,
+              'related_topics': [[related_topic.topic1, related_topic.topic2,
+                                  related_topic.coexist, related_topic.bidirectional]
+                                 for related_topic in extractor.related_topics],
+              'words_num': len(words),
+              'relations_num': len(relation_words)}
+
+    _write_sections(file, MAGIC, VERSION, header, blobs)
+
+
+def write_counts(counts, file):
+    """Write a TrainingCounts in the columnar binary format of the models
+
+    The json header holds the topics, the sections the words with their
+    counts and the (word index, topic index, count) of the relations
+
+    :param counts: TrainingCounts
+    :param file: binary file object
+    """
+    words_index = {word_label: index for index, word_label in enumerate(counts.word_counts)}
+    topics_index = {topic_label: index for index, topic_label in enumerate(counts.topics)}
+
+    relation_words = []
+    relation_topics = []
+    for word_label, topic_label in counts.relation_counts:
+        relation_words.append(words_index[word_label])
+        relation_topics.append(topics_index[topic_label])
+
+    blobs = [*_strings_blobs(words_index),
+             ('word_counts', _to_bytes(counts.word_counts.values(), 'd')),
+             ('relation_words', _to_bytes(relation_words, 'I')),
+             ('relation_topics', _to_bytes(relation_topics, 'I')),
+             ('relation_counts', _to_bytes(counts.relation_counts.values(), 'd'))]
+
+    header = {'topics': counts.topics,
+              'words_num': len(words_index),
+              'relations_num': len(relation_words)}
+
+    _write_sections(file, COUNTS_MAGIC, COUNTS_VERSION, header, blobs)
+
+
+def read_counts(file_path):
+    """Read a file written by write_counts
+
+    :param file_path: str
+    :return: tuple (topics, words, word_counts, relation_words, relation_topics, relation_counts)
+    """
+    with open(file_path, 'rb') as file:
+        buffer = file.read()
+
+    _, header, sections = _read_sections(buffer, COUNTS_MAGIC, COUNTS_VERSION, file_path, 'counts')
+    return (header['topics'], list(sections['words']), sections['word_counts'], sections['relation_words'],
+            sections['relation_topics'], sections['relation_counts'])
+
+
+class ModelFile:
+    """
+    This class represents a memory mapped model in the binary format
+
+    The arrays are views of the mapped file, the pages are loaded on
+    access and shared by all the processes that map the same file
+
+    Variables
+    ----------
+    version: int
+    header: dict
+        The json header of the file
+    words: MappedWords or list
+        Labels of the words, the index of a word is its position,
+        a list for the files before version 2
+    word_counts: memoryview
+    relation_words: memoryview
+    relation_topics: memoryview
+    relation_counts: memoryview
+    relation_offsets: memoryview
+        None for the files before version 3
+    relation_weights: memoryview
+        None for the files before version 3
+    """
+    relation_offsets = None
+    relation_weights = None
+
+    def __init__(self, file_path):
+        """
+        :param file_path: str
+        """
+        with open(file_path, 'rb') as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        self.version, self.header, sections = _read_sections(self._mmap, MAGIC, VERSION, file_path, 'model')
+        for name, section in sections.items():
+            setattr(self, name, section)
+        self._sections = list(sections)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def array(self, name):
+        """Get a section as a numpy array sharing the mapped memory
+
+        :param name: str
+        :return: numpy.ndarray
+        """
+        from tpsx.compiled import _import_numpy
+
+        np = _import_numpy()
+        typecode = dict(SECTIONS + MODEL_SECTIONS)[name]
+        offset, size = self.header['sections'][name]
+        dtype = np.dtype(_DTYPES[typecode])
+        return np.frombuffer(self._mmap, dtype=dtype, count=size // dtype.itemsize, offset=offset)
+
+    def close(self):
+        """Close the mapped file
+
+        The sections of the file can't be used anymore, the mapping can't
+        be closed while a numpy array given by array or a section taken
+        from this object still exists
+        """
+        for name in self._sections:
+            self.__dict__.pop(name, None)
+        self._mmap.close()
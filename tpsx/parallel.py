@@ -0,0 +1,166 @@
+import os
+import weakref
+from collections import deque
+
+# Model loaded once in every worker process by _init_worker
+_worker_model = None
+
+# Executors created by model_executor, their workers hold a model
+_model_executors = weakref.WeakSet()
+
+
+def _init_worker(model, mapped=False):
+    global _worker_model
+
+    if isinstance(model, str):
+        if mapped:
+            from tpsx.topics_extractor import MappedModel
+            model = MappedModel(model)
+        else:
+            from tpsx.topics_extractor import TopicsExtractor
+            model = TopicsExtractor.load(model)
+
+    _worker_model = model
+
+
+def _predict_document(sentences, merge_topics, sort_results):
+    return _worker_model.predict(sentences, merge_topics, sort_results)
+
+
+def _predict_chunk(task):
+    from tpsx.topics_extractor import MappedModel
+
+    documents, merge_topics, sort_results = task
+    if isinstance(_worker_model, MappedModel):
+        # The chunk is scored with one sparse product
+        return _worker_model.predict_batch(list(documents), merge_topics, sort_results)
+    return [_worker_model.predict(document, merge_topics, sort_results) for document in documents]
+
+
+def _count_chunk(corpus):
+    return _worker_model._count_corpus(corpus)
+
+
+def _chunks(iterable, chunksize):
+    chunk = []
+    for element in iterable:
+        chunk.append(element)
+        if len(chunk) == chunksize:
+            yield chunk
+            chunk = []
+
+    if chunk:
+        yield chunk
+
+
+def _imap_ordered(pool, func, tasks, window):
+    # Unlike Pool.imap, never reads more than window tasks ahead of the results
+    pending = deque()
+    for task in tasks:
+        pending.append(pool.apply_async(func, (task,)))
+        if len(pending) >= window:
+            yield pending.popleft().get()
+
+    while pending:
+        yield pending.popleft().get()
+
+
+def _pool(model, processes, mp_context, mapped=False):
+    import multiprocessing
+
+    context = mp_context or multiprocessing.get_context()
+    return context.Pool(processes, initializer=_init_worker, initargs=(model, mapped))
+
+
+def model_executor(model, processes=None, mp_context=None, mapped=False):
+    """Create a process pool executor whose workers load the model once
+
+    TopicsExtractor.apredict and apredict_many run the predictions of
+    this executor on the worker model instead of pickling the extractor
+    with every task
+
+    :param model: TopicsExtractor, MappedModel or str
+    :param processes: int
+        Number of worker processes, None uses all the cpus
+    :param mp_context: multiprocessing context used to create the workers
+    :param mapped: bool
+        If true a path of a tpsx model is opened by every worker as a
+        MappedModel, the workers share the pages of the mapped file
+    :return: concurrent.futures.ProcessPoolExecutor
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    executor = ProcessPoolExecutor(processes, mp_context=mp_context, initializer=_init_worker,
+                                   initargs=(model, mapped))
+    _model_executors.add(executor)
+    return executor
+
+
+def is_model_executor(executor):
+    """Check if an executor was created by model_executor
+
+    :param executor: concurrent.futures.Executor
+    :return: bool
+    """
+    return executor in _model_executors
+
+
+def predict_many(model, documents, processes=None, chunksize=64, merge_topics=True, sort_results=True,
+                 mp_context=None, mapped=False):
+    """Predict the topics of many documents with a pool of processes
+
+    The model is loaded once by every worker, with the fork start method
+    the workers share the parent memory, a path of a saved model can be
+    given to let every worker load it from the file
+
+    :param model: TopicsExtractor, MappedModel or str
+    :param documents: iterable, every document accepts the sentences of predict
+    :param processes: int
+        Number of worker processes, None uses all the cpus
+    :param chunksize: int
+        Number of documents sent to a worker in a single task
+    :param merge_topics: bool
+    :param sort_results: bool
+    :param mp_context: multiprocessing context used to create the pool
+    :param mapped: bool
+        If true a path of a tpsx model is opened by every worker as a
+        MappedModel, ready in milliseconds and with the pages of the file
+        shared by the workers, the outputs are the ones of predict_batch
+    :return: generator of the predict outputs, in the order of the documents
+    """
+    processes = processes or os.cpu_count()
+
+    if hasattr(model, '_get_postings'):
+        # Build the index before the fork so that every worker shares it
+        model._get_postings()
+
+    tasks = ((chunk, merge_topics, sort_results) for chunk in _chunks(documents, chunksize))
+
+    with _pool(model, processes, mp_context, mapped) as pool:
+        for results in _imap_ordered(pool, _predict_chunk, tasks, processes * 2):
+            yield from results
+
+
+def count_corpus(model, corpus, processes=None, chunksize=256, mp_context=None):
+    """Clean and count a labelled corpus with a pool of processes
+
+    :param model: TopicsExtractor or str
+        The model whose cleaner is used
+    :param corpus: iterable of (topics, examples)
+    :param processes: int
+        Number of worker processes, None uses all the cpus
+    :param chunksize: int
+        Number of examples sent to a worker in a single task
+    :param mp_context: multiprocessing context used to create the pool
+    :return: TrainingCounts
+    """
+    from tpsx.topics_extractor import TrainingCounts
+
+    processes = processes or os.cpu_count()
+    counts = TrainingCounts()
+
+    with _pool(model, processes, mp_context) as pool:
+        for chunk_counts in _imap_ordered(pool, _count_chunk, _chunks(corpus, chunksize), processes * 2):
+            counts.merge(chunk_counts)
+
+    return counts
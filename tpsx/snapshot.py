@@ -0,0 +1,260 @@
+from array import array
+
+
+def _word_postings(word_relations):
+    return tuple(word_relations.values()), array('d', [relation.weight for relation in word_relations.values()])
+
+
+class PostingsIndex:
+    """
+    This class represents the word -> (tuple of Relation, array of weights)
+    posting lists of a snapshot
+
+    The words are split by hash in buckets, held by pages of PAGE_SIZE
+    buckets. A new snapshot copies only the pages and the buckets of the
+    changed words and shares the others, so publishing a change doesn't
+    cost the size of the vocabulary
+    """
+    PAGE_BITS = 8
+    PAGE_SIZE = 1 << PAGE_BITS
+    # Average number of words of a bucket kept by a full rebuild
+    BUCKET_SIZE = 16
+    # The buckets are rebuilt when their average size is over this
+    MAX_BUCKET_SIZE = 64
+
+    def __init__(self, pages, buckets_num, size):
+        """
+        :param pages: list of list of dict
+        :param buckets_num: int
+            A power of 2
+        :param size: int
+            Number of words
+        """
+        self._pages = pages
+        self._buckets_num = buckets_num
+        self._mask = buckets_num - 1
+        self._size = size
+
+    @classmethod
+    def from_items(cls, items, size):
+        """
+        :param items: iterable of (word label, posting list)
+        :param size: int
+            Number of items
+        :return: PostingsIndex
+        """
+        buckets_num = 1
+        while buckets_num * cls.BUCKET_SIZE < size:
+            buckets_num *= 2
+
+        page_size = min(buckets_num, cls.PAGE_SIZE)
+        pages = [[{} for _ in range(page_size)] for _ in range(buckets_num // page_size)]
+        mask = buckets_num - 1
+        for word_label, word_postings in items:
+            bucket_index = hash(word_label) & mask
+            pages[bucket_index >> cls.PAGE_BITS][bucket_index & (cls.PAGE_SIZE - 1)][word_label] = word_postings
+
+        return cls(pages, buckets_num, size)
+
+    def _bucket(self, word_label):
+        bucket_index = hash(word_label) & self._mask
+        return self._pages[bucket_index >> self.PAGE_BITS][bucket_index & (self.PAGE_SIZE - 1)]
+
+    def get(self, word_label, default=None):
+        return self._bucket(word_label).get(word_label, default)
+
+    def __getitem__(self, word_label):
+        return self._bucket(word_label)[word_label]
+
+    def __contains__(self, word_label):
+        return word_label in self._bucket(word_label)
+
+    def __len__(self):
+        return self._size
+
+    def _buckets(self):
+        for page in self._pages:
+            yield from page
+
+    def __iter__(self):
+        for bucket in self._buckets():
+            yield from bucket
+
+    def items(self):
+        for bucket in self._buckets():
+            yield from bucket.items()
+
+    def values(self):
+        for bucket in self._buckets():
+            yield from bucket.values()
+
+    def __sizeof__(self):
+        return (object.__sizeof__(self) + self._pages.__sizeof__() +
+                sum(page.__sizeof__() for page in self._pages) +
+                sum(bucket.__sizeof__() for bucket in self._buckets()))
+
+    def updated(self, changes):
+        """Get a copy with the posting lists of some words changed
+
+        :param changes: dict
+            word label -> posting list, None to remove the word
+        :return: PostingsIndex
+        """
+        pages = list(self._pages)
+        copied_pages = set()
+        copied_buckets = set()
+        size = self._size
+        for word_label, word_postings in changes.items():
+            bucket_index = hash(word_label) & self._mask
+            page_index = bucket_index >> self.PAGE_BITS
+            slot = bucket_index & (self.PAGE_SIZE - 1)
+            if page_index not in copied_pages:
+                pages[page_index] = list(pages[page_index])
+                copied_pages.add(page_index)
+            if bucket_index not in copied_buckets:
+                pages[page_index][slot] = dict(pages[page_index][slot])
+                copied_buckets.add(bucket_index)
+
+            bucket = pages[page_index][slot]
+            if word_postings is None:
+                if bucket.pop(word_label, None) is not None:
+                    size -= 1
+            else:
+                if word_label not in bucket:
+                    size += 1
+                bucket[word_label] = word_postings
+
+        postings = PostingsIndex(pages, self._buckets_num, size)
+        if size > self._buckets_num * self.MAX_BUCKET_SIZE:
+            # Amortized, the vocabulary grew MAX_BUCKET_SIZE / BUCKET_SIZE times since the last rebuild
+            postings = PostingsIndex.from_items(postings.items(), size)
+        return postings
+
+
+def build_postings(relations, word_labels=None, postings=None):
+    """Build the word -> (tuple of Relation, array of weights) posting lists
+
+    :param relations: dict
+        word label -> {topic label -> Relation}
+    :param word_labels: iterable
+        Words to rebuild, if None all the words are built
+    :param postings: PostingsIndex
+        Posting lists to copy, the words not rebuilt are shared with it
+    :return: PostingsIndex
+    """
+    if word_labels is None:
+        items = [(word_label, _word_postings(word_relations))
+                 for word_label, word_relations in relations.items() if word_relations]
+        return PostingsIndex.from_items(items, len(items))
+
+    changes = {}
+    for word_label in word_labels:
+        word_relations = relations.get(word_label)
+        changes[word_label] = _word_postings(word_relations) if word_relations else None
+
+    return postings.updated(changes)
+
+
+class RelatedTopicsIndex:
+    """
+    This class represents the related topics compiled in a signed adjacency index
+
+    A topic is related at most once with another topic, the first
+    RelatedTopic of a pair of topics wins
+
+    Variables
+    ----------
+    related: dict
+        topic label -> tuple of (coexist, topic label), in the order of
+        the related topics
+    """
+
+    def __init__(self, related_topics=()):
+        """
+        :param related_topics: iterable of (topic1, topic2, coexist, bidirectional)
+        """
+        related = {}
+        for topic1, topic2, coexist, bidirectional in related_topics:
+            related.setdefault(topic1, {}).setdefault(topic2, coexist)
+            if bidirectional:
+                related.setdefault(topic2, {}).setdefault(topic1, coexist)
+
+        self.related = {topic_label: tuple((coexist, related_label)
+                                           for related_label, coexist in topic_related.items())
+                        for topic_label, topic_related in related.items()}
+
+    def get(self, topic_label):
+        """Get the topics related with a topic
+
+        :param topic_label: str
+        :return: tuple of (coexist, topic label)
+        """
+        return self.related.get(topic_label, ())
+
+    def indexed(self, topic_labels):
+        """Get the related topics with topic indices instead of labels
+
+        :param topic_labels: list of str
+        :return: list, for every topic a list of (coexist, topic index)
+        """
+        topics_index = {label: index for index, label in enumerate(topic_labels)}
+        return [[(coexist, topics_index[related_label]) for coexist, related_label in self.get(topic_label)]
+                for topic_label in topic_labels]
+
+    def adjacency(self, topic_labels):
+        """Get the signed topic x topic adjacency matrix
+
+        adjacency[t, r] is 1 if the topic r coexists with t, -1 if it
+        doesn't and 0 if they are not related, numpy is required
+
+        :param topic_labels: list of str
+            Topic of every row and column
+        :return: numpy.ndarray
+        """
+        from tpsx.compiled import _import_numpy
+
+        np = _import_numpy()
+        matrix = np.zeros((len(topic_labels), len(topic_labels)), dtype=np.float64)
+        for topic_index, topic_related in enumerate(self.indexed(topic_labels)):
+            for coexist, related_index in topic_related:
+                matrix[topic_index, related_index] = 1 if coexist else -1
+        return matrix
+
+
+class ModelSnapshot:
+    """
+    This class represents an immutable state of a model read by the predictions
+
+    A TopicsExtractor publishes a new snapshot after every change, readers
+    keep a reference to the snapshot they started with and never see a
+    partially updated model
+
+    Variables
+    ----------
+    postings: PostingsIndex
+        word label -> (tuple of Relation, array of weights)
+    topics: tuple
+        The Topic objects sorted by label
+    related: RelatedTopicsIndex
+    """
+
+    def __init__(self, postings, topics, related):
+        """
+        :param postings: PostingsIndex
+        :param topics: tuple of Topic
+        :param related: RelatedTopicsIndex
+        """
+        self.postings = postings
+        self.topics = topics
+        self.related = related
+        self._compiled = None
+
+    def compile(self):
+        """Get the CompiledModel of the snapshot, built on the first call
+
+        :return: CompiledModel
+        """
+        if self._compiled is None:
+            from tpsx.compiled import CompiledModel
+            self._compiled = CompiledModel.from_snapshot(self)
+        return self._compiled
@@ -0,0 +1,81 @@
+import threading
+from collections import Counter
+
+
+class PipelineStats:
+    """
+    This class is used to collect the timings and the counters of the
+    stages of the cleaning, the training and the predictions
+
+    A stats object is given to a TextCleaner or enabled on a
+    TopicsExtractor with enable_stats, without it nothing is measured
+
+    Variables
+    ----------
+    seconds: Counter
+        Total time spent in every stage
+    calls: Counter
+        Number of runs of every stage
+    counters: Counter
+        Counters of the stages, e.g. tokens, stems, relations
+    hooks: list
+        Callables called with (stage, seconds, counters) after every run of a stage
+    """
+
+    def __init__(self, hooks=None):
+        """
+        :param hooks: list of callable
+        """
+        self.seconds = Counter()
+        self.calls = Counter()
+        self.counters = Counter()
+        self.hooks = list(hooks or ())
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        state['hooks'] = []
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def add_hook(self, hook):
+        """
+        :param hook: callable of (stage, seconds, counters)
+        """
+        self.hooks.append(hook)
+
+    def record(self, stage, seconds, **counters):
+        """Record a run of a stage
+
+        :param stage: str
+        :param seconds: float
+        :param counters: int
+            Values added to the counters
+        """
+        with self._lock:
+            self.seconds[stage] += seconds
+            self.calls[stage] += 1
+            self.counters.update(counters)
+
+        for hook in self.hooks:
+            hook(stage, seconds, counters)
+
+    def info(self):
+        """Get the collected statistics
+
+        :return: dict
+        """
+        with self._lock:
+            return {'stages': {stage: {'calls': self.calls[stage], 'seconds': self.seconds[stage]}
+                               for stage in self.calls},
+                    'counters': dict(self.counters)}
+
+    def reset(self):
+        with self._lock:
+            self.seconds.clear()
+            self.calls.clear()
+            self.counters.clear()
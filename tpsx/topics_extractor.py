@@ -1,7 +1,21 @@
 import os
+import sys
+import csv
+import math
+import time
+import heapq
 import pickle
 import datetime
+import functools
+import threading
+from array import array
+from collections import Counter, deque
 from tpsx import TextCleaner
+from tpsx.stats import PipelineStats
+from tpsx.compiled import CompiledModel
+from tpsx.snapshot import ModelSnapshot, PostingsIndex, RelatedTopicsIndex, build_postings
+from tpsx.model_file import ModelFile, is_model_file, read_counts, write_counts, write_model
+from tpsx import parallel
 
 DANISH = 'danish'
 DUTCH = 'dutch'
@@ -19,7 +33,59 @@ SPANISH = 'spanish'
 SWEDISH = 'swedish'
 
 
-class Result:
+# Counts are rescaled when the value of a new occurrence is over this
+_MAX_UPDATE_SCALE = 1e100
+
+_TRUE_VALUES = ('true', 'yes', '1')
+_FALSE_VALUES = ('false', 'no', '0')
+
+
+def _topics_pair(topic1, topic2):
+    # Key of a relation, the same for both the directions
+    return (topic1, topic2) if topic1 < topic2 else (topic2, topic1)
+
+
+def _stored_count(count):
+    # Counts are stored as float, the ones of a training without decay are int
+    return int(count) if count.is_integer() else count
+
+
+def _as_stems(sentence):
+    # The stems of a sentence already cleaned, e.g. by TextCleaner.clean_text, None for a text
+    if not isinstance(sentence, (list, tuple)):
+        return None
+    if not all(isinstance(stem, str) for stem in sentence):
+        raise ValueError('Invalid stems, must be a list of str')
+    return sentence
+
+
+def _parse_bool(value):
+    if value.lower() in _TRUE_VALUES:
+        return True
+    if value.lower() in _FALSE_VALUES:
+        return False
+    raise ValueError(f'Invalid boolean value: {value}')
+
+
+class _Slots:
+    """
+    Base class of the model objects, they use __slots__ to save memory
+    """
+    __slots__ = ()
+
+    def __setstate__(self, state):
+        # Objects pickled before __slots__ have a __dict__ state
+        if isinstance(state, tuple):
+            dict_state, slots_state = state
+            state = {**(dict_state or {}), **(slots_state or {})}
+
+        for cls in type(self).__mro__:
+            for name in getattr(cls, '__slots__', ()):
+                if name in state:
+                    setattr(self, name, state[name])
+
+
+class Result(_Slots):
     """
     This class represents the output of the algorithm
     contains all the information used to determine the score of a topics
@@ -42,6 +108,8 @@ class Result:
     topic_score:
         The final score merged with the other topics
     """
+    __slots__ = ('topic', 'related_words', 'related_words_num',
+                 'related_topics', 'related_topics_num', 'score', 'topic_score')
 
     def __init__(self, topic):
         """
@@ -87,10 +155,11 @@ class Result:
         return string
 
 
-class Word:
+class Word(_Slots):
     """
         This class is used to represent a Topic
     """
+    __slots__ = ('_id', 'label', 'count')
     _ids = 0
 
     def __init__(self, word):
@@ -106,10 +175,11 @@ class Word:
         return f"""{'-'*20} id {self._id} {'-'*20}\nword = {self.label}\noccurrences = {self.count}\n"""
 
 
-class Topic:
+class Topic(_Slots):
     """
     This class is used to represent a Topic
     """
+    __slots__ = ('_id', 'label')
     _ids = 0
 
     def __init__(self, label):
@@ -125,10 +195,11 @@ class Topic:
         return f"""{'-'*20} id {self._id} {'-'*20}\ntopic_label = {self.label}\n\n"""
 
 
-class Relation:
+class Relation(_Slots):
     """
     This class is used to represent the relation of a topics and a word
     """
+    __slots__ = ('_id', 'topic', 'word', 'word_count')
     _ids = 0
 
     def __init__(self, topic, word):
@@ -142,18 +213,26 @@ class Relation:
         self.topic = topic
         self.word = word
         self.word_count = 1
-        self.weight = self.word_count / word.count
+
+    @property
+    def weight(self):
+        """Share of the word occurrences related to the topic
+
+        :return: float
+        """
+        return self.word_count / self.word.count
 
     def __str__(self):
         return f"{'-'*20} id {self._id} {'-'*20}\ntopic_label = {self.topic.label} \
                 \nword = {self.word.label}\nweight = {self.weight}\n\n"
 
 
-class RelatedTopic:
+class RelatedTopic(_Slots):
     """
     This class is used to represent a relation between
     two topics
     """
+    __slots__ = ('_id', 'topic1', 'topic2', 'coexist', 'bidirectional')
     _ids = 0
 
     def __init__(self, topic1, topic2, coexist, bidirectional):
@@ -180,92 +259,384 @@ class RelatedTopic:
         return f"{'-'*20} id {self._id} {'-'*20}\n{self.topic1} -{'-' if self.coexist else 'x'}{'-' if self.bidirectional else '>'} {self.topic2}"
 
 
+class TrainingCounts:
+    """
+    This class is used to aggregate the word and topic counts
+    of a labelled corpus before committing them to a model
+
+    The counts of the shards of a corpus can be computed apart, saved and
+    merged in any grouping, a model trained with the merged counts has the
+    weights of a model trained with the whole corpus
+
+    Variables
+    ----------
+    topics: list
+        Labels of the topics found in the corpus, in order of appearance
+    word_counts: Counter
+        Occurrences of every word, counted once for each topic of the example
+    relation_counts: Counter
+        Occurrences of every (word label, topic label) pair
+    """
+
+    def __init__(self):
+        # Insertion ordered, the membership of a topic is checked in constant time
+        self._topics = {}
+        self.word_counts = Counter()
+        self.relation_counts = Counter()
+
+    @property
+    def topics(self):
+        """Labels of the topics in order of appearance
+
+        :return: list of str
+        """
+        return list(self._topics)
+
+    @topics.setter
+    def topics(self, topics):
+        self._topics = dict.fromkeys(topics)
+
+    def add(self, topics, stems):
+        """Count the stems of an example related to a list of topics
+
+        :param topics: list of str
+        :param stems: iterable of str
+        """
+        if not topics:
+            return
+
+        self._topics.update(dict.fromkeys(topics))
+
+        topics_num = len(topics)
+        for stem in stems:
+            self.word_counts[stem] += topics_num
+            for topic in topics:
+                self.relation_counts[(stem, topic)] += 1
+
+    def merge(self, other):
+        """Add the counts of another TrainingCounts
+
+        :param other: TrainingCounts
+        :return: TrainingCounts
+        """
+        self._topics.update(other._topics)
+
+        self.word_counts.update(other.word_counts)
+        self.relation_counts.update(other.relation_counts)
+
+        return self
+
+    def save(self, file_path):
+        """Save the counts in the columnar binary format
+
+        :param file_path: str
+        """
+        with open(file_path, 'wb') as file:
+            write_counts(self, file)
+
+    @classmethod
+    def load(cls, file_path):
+        """Load counts saved with save
+
+        :param file_path: str
+        :return: TrainingCounts
+        """
+        topics, words, word_counts, relation_words, relation_topics, relation_counts = read_counts(file_path)
+
+        counts = cls()
+        counts.topics = list(topics)
+        counts.word_counts = Counter({word_label: _stored_count(count)
+                                      for word_label, count in zip(words, word_counts)})
+        counts.relation_counts = Counter({(words[word_index], topics[topic_index]): _stored_count(count)
+                                          for word_index, topic_index, count in zip(relation_words,
+                                                                                    relation_topics,
+                                                                                    relation_counts)})
+        return counts
+
+
+def _compiled_predictions(compiled, documents, merge_topics, sort_results, top_k, min_score, details):
+    # The output of predict_batch for the cleaned documents
+    scores, topic_scores, related_words_nums, first_matches = compiled.score(documents, merge_topics)
+
+    predictions = []
+    for doc_index in range(len(documents)):
+        first_match = first_matches[doc_index]
+        matched = (first_match >= 0).nonzero()[0]
+        matched = matched[first_match[matched].argsort(kind='stable')]
+
+        topics = {}
+        results = {}
+        for topic_index in matched.tolist():
+            result = Result(compiled.topics[topic_index])
+            result.score = float(scores[doc_index, topic_index])
+            result.topic_score = float(topic_scores[doc_index, topic_index])
+            result.related_words_num = int(related_words_nums[doc_index, topic_index])
+            topics[result.topic.label] = result
+            results[topic_index] = result
+
+        if merge_topics:
+            for topic_index, result in results.items():
+                for coexist, related_index in compiled.related[topic_index]:
+                    if related_index not in results:
+                        continue
+                    if details:
+                        result.related_topics.append([coexist, results[related_index]])
+                    else:
+                        result.related_topics_num += 1
+                if details:
+                    result.related_topics_num = len(result.related_topics)
+
+        predictions.append(TopicsExtractor._select_results(topics, sort_results, top_k, min_score))
+
+    return predictions
+
+
+def _writer(method):
+    # Serialize the methods that change a TopicsExtractor, predictions are never locked
+    @functools.wraps(method)
+    def locked(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+
+    return locked
+
+
 class TopicsExtractor:
     """
     This class is used to create and execute the model
     to extract the text topics
-    """
 
-    def __init__(self, language):
+    Every change publishes a new immutable ModelSnapshot, predictions read
+    the snapshot published when they start, so a model can be trained by a
+    thread while other threads use it
+    """
+    # Value of a new occurrence, it grows when update decays the older counts
+    _update_scale = 1
+    # Number of updates kept by the sliding window, None keeps all of them
+    _update_window = None
+    # PipelineStats of the training and the predictions, see enable_stats
+    stats = None
+
+    def __init__(self, language, stem_cache=None, **cleaner_options):
         """
         :param language: str
             language used in the model
+        :param stem_cache: StemCache
+            Stem cache shared with other cleaners, if None the cleaner has its own
+        :param cleaner_options:
+            Other options of the TextCleaner, e.g. fast_tokenizer
         """
         self.language = language.lower()
-        self.cleaner = TextCleaner(language)
+        self.cleaner = TextCleaner(language, stem_cache, **cleaner_options)
 
-        self.words = []
-        self.topics = []
-        self.relations = []
+        # label -> Word, label -> Topic and word label -> {topic label -> Relation}
+        self._words = {}
+        self._topics = {}
+        self._relations = {}
         self.related_topics = []
+        # (topic1, topic2) sorted label pair -> RelatedTopic
+        self._related_pairs = {}
+
+        self._lock = threading.RLock()
+        self._snapshot = ModelSnapshot(PostingsIndex.from_items((), 0), (), RelatedTopicsIndex())
+
+        self._invalidate_views()
+
+    def __getstate__(self):
+        # The containers are copied under the lock, pickle walks them once it is released
+        with self._lock:
+            state = self.__dict__.copy()
+            state['_words'] = dict(self._words)
+            state['_topics'] = dict(self._topics)
+            state['_relations'] = {word_label: dict(word_relations)
+                                   for word_label, word_relations in self._relations.items()}
+            state['related_topics'] = list(self.related_topics)
+            if state.get('_update_history') is not None:
+                state['_update_history'] = self._update_history.copy()
+        del state['_lock']
+        del state['_snapshot']
+        del state['_related_pairs']
+        state.pop('stats', None)
+        return state
+
+    def __setstate__(self, state):
+        # Models pickled before the indexed store kept plain lists
+        if 'relations' in state:
+            words = state.pop('words')
+            topics = state.pop('topics')
+            relations = state.pop('relations')
+            self.__dict__.update(state)
+
+            self._words = {word.label: word for word in words}
+            self._topics = {topic.label: topic for topic in topics}
+            self._relations = {}
+            for relation in relations:
+                self._relations.setdefault(relation.word.label, {})[relation.topic.label] = relation
+            self._invalidate_views()
+        else:
+            self.__dict__.update(state)
 
-    def _spread_word(self, word, topic_label, count):
-        exists = False
-        for relation in self.relations:
-            if relation.word.label == word.label:
-                if relation.topic.label == topic_label:
-                    exists = True
-                    relation.word_count += 1
-                    relation.weight = relation.word_count / count
-                    break
-                else:
-                    relation.weight = relation.word_count / count
+        # Indexes pickled before the snapshots
+        self.__dict__.pop('_postings', None)
+        self.__dict__.pop('_compiled', None)
+
+        self._index_related_topics()
+        self._lock = threading.RLock()
+        self._publish()
+
+    @property
+    def words(self):
+        """Words of the model sorted by label
+
+        :return: list of Word
+        """
+        with self._lock:
+            if self._words_view is None:
+                self._words_view = sorted(self._words.values(), key=lambda o: o.label)
+            return self._words_view
+
+    @property
+    def topics(self):
+        """Topics of the model sorted by label
 
-        if not exists:
+        :return: list of Topic
+        """
+        with self._lock:
+            if self._topics_view is None:
+                self._topics_view = sorted(self._topics.values(), key=lambda o: o.label)
+            return self._topics_view
+
+    @property
+    def relations(self):
+        """Relations of the model sorted by word label
+
+        :return: list of Relation
+        """
+        with self._lock:
+            if self._relations_view is None:
+                self._relations_view = [relation
+                                        for word_label in sorted(self._relations)
+                                        for relation in self._relations[word_label].values()]
+            return self._relations_view
+
+    def _invalidate_views(self):
+        self._words_view = None
+        self._topics_view = None
+        self._relations_view = None
+
+    def _publish(self, word_labels=None, related=False):
+        """Publish a new snapshot of the model for the predictions
+
+        The posting lists of the unchanged words are shared with the
+        previous snapshot, see PostingsIndex
+
+        :param word_labels: iterable
+            Labels of the changed words, if None the whole snapshot is rebuilt
+        :param related: bool
+            If true the related topics changed
+        """
+        # Every part is built before the only write of the snapshot, a full
+        # rebuild doesn't read the previous one, missing in __setstate__
+        if word_labels is None:
+            snapshot = None
+            postings = build_postings(self._relations)
+            related = True
+        else:
+            snapshot = self._snapshot
+            if word_labels:
+                postings = build_postings(self._relations, word_labels, snapshot.postings)
+            else:
+                postings = snapshot.postings
+
+        if related:
+            related_index = RelatedTopicsIndex((related_topic.topic1, related_topic.topic2,
+                                                related_topic.coexist, related_topic.bidirectional)
+                                               for related_topic in self.related_topics)
+        else:
+            related_index = snapshot.related
+
+        # Topics are never removed, the same number means the same topics
+        if snapshot is not None and len(snapshot.topics) == len(self._topics):
+            topics = snapshot.topics
+        else:
+            topics = tuple(self.topics)
+
+        self._snapshot = ModelSnapshot(postings, topics, related_index)
+
+    def _get_postings(self):
+        """Get the word -> relations posting lists used by the predictions
+
+        The posting lists hold the relation weights computed once from the
+        word counts when the snapshot is published
+
+        :return: PostingsIndex
+        """
+        return self._snapshot.postings
+
+    def _spread_word(self, word, topic_label):
+        word_relations = self._relations.setdefault(word.label, {})
+        relation = word_relations.get(topic_label)
+
+        if relation:
+            relation.word_count += self._update_scale
+        else:
             topic = self.get_topic(topic_label)
 
             if not topic:
                 raise ValueError(f'Topic: {topic_label} is not defined')
 
-            new_relation = Relation(topic, word)
-            self.relations.append(new_relation)
+            relation = Relation(topic, word)
+            relation.word_count = self._update_scale
+            word_relations[topic_label] = relation
+            self._relations_view = None
 
+    @_writer
     def add_word(self, word_label, topic_label):
         """Adds a word related to a topics
 
         :param word_label: str
         :param topic_label: str
         """
-        count = 1
-        exists = False
-        word_res = None
-        for word in self.words:
-            if word.label == word_label:
-                word_res = word
-                exists = True
-                count = word.count + 1
-                word.count = count
-                break
+        word = self._words.get(word_label)
 
-        if not exists:
-            word_res = Word(word_label)
-            self.words.append(word_res)
+        if word:
+            word.count += self._update_scale
+        else:
+            word = Word(word_label)
+            word.count = self._update_scale
+            self._words[word_label] = word
+            self._words_view = None
 
-        self._spread_word(word_res, topic_label, count)
+        self._spread_word(word, topic_label)
+        self._publish((word_label,))
 
+    @_writer
     def add_topic(self, topic_label):
         """Adds a topics
 
         :param topic_label: str
         :return: bool
         """
-        exists = False
-        for topic in self.topics:
-            if topic.label == topic_label:
-                exists = True
-                topic_res = topic_label
-                break
+        if self._add_topic(topic_label):
+            self._publish(())
+            return True
 
-        if not exists:
-            self.topics.append(Topic(topic_label))
+        return False
+
+    def _add_topic(self, topic_label):
+        if topic_label not in self._topics:
+            self._topics[topic_label] = Topic(topic_label)
+            self._topics_view = None
             return True
 
         return False
 
-    def _build_relation(self, topic1, topic2, coexist=True, bidirectional=True):
-        exists = False
-        topic_res = None
+    def _index_related_topics(self):
+        self._related_pairs = {}
+        for related_topic in self.related_topics:
+            self._related_pairs.setdefault(_topics_pair(related_topic.topic1, related_topic.topic2), related_topic)
 
+    def _build_relation(self, topic1, topic2, coexist=True, bidirectional=True):
         if topic1 == topic2:
             raise ValueError('Can\'t create a relation with the same topics')
 
@@ -275,35 +646,27 @@ class TopicsExtractor:
         if not self.get_topic(topic2):
             raise ValueError(f'Topic2 is not defined: {topic2}')
 
-        for related_topic in self.related_topics:
-            if related_topic.topic1 == topic1 and related_topic.topic2 == topic2:
-                exists = True
-                topic_res = related_topic
-                topic_res.bidirectional = bidirectional
-                break
-            elif related_topic.topic2 == topic1 and related_topic.topic1 == topic2:
-                exists = True
-                topic_res = related_topic
-                if not topic_res.bidirectional and not bidirectional:
-                    topic_res.bidirectional = bidirectional
-                    temp = topic_res.topic1
-                    topic_res.topic1 = topic_res.topic2
-                    topic_res.topic2 = temp
-                elif topic_res.bidirectional and not bidirectional:
-                    topic_res.bidirectional = False
-                    temp = topic_res.topic1
-                    topic_res.topic1 = topic_res.topic2
-                    topic_res.topic2 = temp
-                break
-
-        if not exists:
+        pair = _topics_pair(topic1, topic2)
+        topic_res = self._related_pairs.get(pair)
+
+        if topic_res is None:
             topic_res = RelatedTopic(topic1, topic2, coexist, bidirectional)
             self.related_topics.append(topic_res)
-        else:
-            topic_res.coexist = coexist
+            self._related_pairs[pair] = topic_res
+            return topic_res
+
+        if topic_res.topic1 == topic1:
+            topic_res.bidirectional = bidirectional
+        elif not bidirectional:
+            # A one way relation takes the direction of the last definition
+            topic_res.bidirectional = False
+            topic_res.topic1, topic_res.topic2 = topic_res.topic2, topic_res.topic1
+
+        topic_res.coexist = coexist
 
         return topic_res
 
+    @_writer
     def add_related_topic(self, topics_set1, topics_set2, coexist=True, bidirectional=True):
         """Adds a relation between two topics
 
@@ -331,40 +694,74 @@ class TopicsExtractor:
         if isinstance(topics_set2, str):
             topics_set2 = [topics_set2]
 
-        for topics_set1_element in topics_set1:
-            for topics_set2_element in topics_set2:
-                topic_res.append(self._build_relation(topics_set1_element,
-                                                  topics_set2_element,
-                                                  coexist,
-                                                  bidirectional))
+        try:
+            for topics_set1_element in topics_set1:
+                for topics_set2_element in topics_set2:
+                    topic_res.append(self._build_relation(topics_set1_element,
+                                                          topics_set2_element,
+                                                          coexist,
+                                                          bidirectional))
+        finally:
+            # The relations built before an error are published too
+            self._publish((), related=True)
+
+        return topic_res
+
+    @_writer
+    def add_related_topics(self, related_topics):
+        """Adds many relations between two topics at once
+
+        Every relation is defined like in add_related_topic, a relation
+        of two topics already related replaces the previous one
+
+        :param related_topics: iterable of tuple
+            (topic1, topic2), (topic1, topic2, coexist) or
+            (topic1, topic2, coexist, bidirectional)
+        :return: list of RelatedTopic
+        """
+        topic_res = []
+
+        try:
+            for related_topic in related_topics:
+                if not 2 <= len(related_topic) <= 4:
+                    raise ValueError(f'Invalid related topic: {related_topic}')
+                topic_res.append(self._build_relation(*related_topic))
+        finally:
+            self._publish((), related=True)
 
         return topic_res
 
+    def load_related_topics(self, file_path, delimiter=','):
+        """Adds the relations between topics of a csv file
+
+        Every row holds topic1, topic2 and optionally coexist and bidirectional
+        (true/false, yes/no or 1/0), a first row starting with topic1 is
+        skipped as header
+
+        :param file_path: str
+        :param delimiter: str
+        :return: list of RelatedTopic
+        """
+        related_topics = []
+        with open(file_path, newline='', encoding='utf-8') as file:
+            for row_index, row in enumerate(csv.reader(file, delimiter=delimiter)):
+                row = [value.strip() for value in row]
+                if not row or row_index == 0 and row[0].lower() == 'topic1':
+                    continue
+                related_topics.append(row[:2] + [_parse_bool(value) for value in row[2:]])
+
+        return self.add_related_topics(related_topics)
+
     def get_related_topic(self, topic_label):
         """Get the related topics of a topics by its label
 
         :param topic_label: str
-        :return: list of str
+        :return: list of [coexist, topic label]
         """
-        topic_res = []
-
         if not self.get_topic(topic_label):
             raise ValueError(f'Topic is not defined: {topic_label}')
 
-        for related_topic in self.related_topics:
-            if related_topic.bidirectional:
-                if related_topic.topic1 == topic_label:
-                    if related_topic.topic2 not in topic_res:
-                        topic_res.append([related_topic.coexist, related_topic.topic2])
-                elif related_topic.topic2 == topic_label:
-                    if related_topic.topic1 not in topic_res:
-                        topic_res.append([related_topic.coexist, related_topic.topic1])
-            else:
-                if related_topic.topic1 == topic_label:
-                    if related_topic.topic2 not in topic_res:
-                        topic_res.append([related_topic.coexist, related_topic.topic2])
-
-        return topic_res
+        return [[coexist, related_label] for coexist, related_label in self._snapshot.related.get(topic_label)]
 
     def get_topic(self, topic_label):
         """Get a topic_label object with the same label
@@ -372,13 +769,7 @@ class TopicsExtractor:
         :param topic_label:
         :return: Topic
         """
-        topic_res = None
-        for topic_index in range(len(self.topics)):
-            if self.topics[topic_index].label == topic_label:
-                topic_res = self.topics[topic_index]
-                break
-
-        return topic_res
+        return self._topics.get(topic_label)
 
     def merge_topics(self, topics):
         """Merge Results based on the defined topic_label relations
@@ -386,91 +777,454 @@ class TopicsExtractor:
         :param topics: dict
         :return:
         """
+        return self._merge_topics(topics, self._snapshot)
+
+    @staticmethod
+    def _merge_topics(topics, snapshot, details=True):
         for topic in topics:
-            for coexist, related_topic in self.get_related_topic(topic):
-                if related_topic in topics:
-                    topics[topic].related_topics.append([coexist, topics[related_topic]])
-            topics[topic].related_topics_num = len(topics[topic].related_topics)
-            topics[topic].merge_topics()
+            result = topics[topic]
+            for coexist, related_topic in snapshot.related.get(topic):
+                if related_topic not in topics:
+                    continue
+                if details:
+                    result.related_topics.append([coexist, topics[related_topic]])
+                else:
+                    # Same sum of Result.merge_topics without the related_topics list
+                    result.related_topics_num += 1
+                    if coexist:
+                        result.topic_score += topics[related_topic].score
+                    else:
+                        result.topic_score -= topics[related_topic].score
+            if details:
+                result.related_topics_num = len(result.related_topics)
+                result.merge_topics()
 
         return topics
 
-    def train(self, topics=None, examples=None):
-        """Give examples of sentences related to a topic_label
+    @staticmethod
+    def _select_results(topics, sort_results, top_k=None, min_score=None):
+        """Keep the best Results of a prediction
 
-        :param topics: str
-        :param examples: list
+        :param topics: dict
+            topic label -> Result
+        :param sort_results: bool
+        :param top_k: int
+            Maximum number of Results, None keeps all of them
+        :param min_score: float
+            Minimum topic_score of a Result, None keeps all of them
+        :return: list sorted by topic_score if sort_results else dict
         """
+        if top_k is not None and top_k < 0:
+            raise ValueError('top_k must be a positive int')
+
+        results = topics.values()
+        if min_score is not None:
+            results = [result for result in results if result.topic_score >= min_score]
+
+        if top_k is not None:
+            # Ties keep the order of sorted
+            results = heapq.nlargest(top_k, results, key=lambda t: t.topic_score)
+        elif sort_results:
+            results = sorted(results, key=lambda t: t.topic_score, reverse=True)
+        elif min_score is None:
+            return topics
+
+        if sort_results:
+            return results
+        selected = {result.topic.label for result in results}
+        return {label: result for label, result in topics.items() if label in selected}
+
+    @staticmethod
+    def _topics_list(topics):
         if not isinstance(topics, str) and not isinstance(topics, list):
             raise ValueError('topics must be str or list of str')
 
-        topics_list = []
-
         if isinstance(topics, str):
-            self.add_topic(topics)
-            topics_list.append(topics)
-        else:
-            for topic in topics:
-                if not isinstance(topic, str):
-                    raise ValueError('Invalid topic in list of topics, must be a str')
-                self.add_topic(topic)
-                topics_list.append(topic)
+            return [topics]
 
+        for topic in topics:
+            if not isinstance(topic, str):
+                raise ValueError('Invalid topic in list of topics, must be a str')
+
+        return list(topics)
+
+    def _clean_examples(self, examples):
         if not isinstance(examples, str) and not isinstance(examples, list):
             raise ValueError('example must be str or list of str')
 
-        cleaned_data = []
-
         if isinstance(examples, str):
-            for data_sentence in self.cleaner.clean_text(examples):
-                for data in data_sentence:
-                    cleaned_data.append(data)
-        else:
-            for example in examples:
-                if not isinstance(example, str):
-                    raise ValueError('Invalid example in list of examples, must be a str')
-                for data_sentence in self.cleaner.clean_text(example):
-                    for data in data_sentence:
-                        cleaned_data.append(data)
+            examples = [examples]
+
+        for example in examples:
+            stems = _as_stems(example)
+            if stems is not None:
+                yield from stems
+                continue
+            if not isinstance(example, str):
+                raise ValueError('Invalid example in list of examples, must be a str or a list of stems')
+            for data_sentence in self.cleaner.clean_text(example):
+                yield from data_sentence
+
+    def _apply_counts(self, counts):
+        """Commit the counts aggregated from a corpus to the model
+
+        Only the posting lists of the counted words are rebuilt
+
+        :param counts: TrainingCounts
+        """
+        scale = self._update_scale
+
+        for topic_label in counts.topics:
+            self._add_topic(topic_label)
+
+        for word_label, count in counts.word_counts.items():
+            word = self._words.get(word_label)
+            if word:
+                word.count += count * scale
+            else:
+                word = Word(word_label)
+                word.count = count * scale
+                self._words[word_label] = word
+                self._words_view = None
+
+        for (word_label, topic_label), count in counts.relation_counts.items():
+            word_relations = self._relations.setdefault(word_label, {})
+            relation = word_relations.get(topic_label)
+            if relation:
+                relation.word_count += count * scale
+            else:
+                relation = Relation(self._topics[topic_label], self._words[word_label])
+                relation.word_count = count * scale
+                word_relations[topic_label] = relation
+                self._relations_view = None
+
+        self._publish(counts.word_counts)
+
+    def _remove_counts(self, counts, scale):
+        """Remove from the model the counts committed with a scale
+
+        Words and relations left without occurrences are deleted
+
+        :param counts: TrainingCounts
+        :param scale: float
+        """
+        # Tolerance on the float counts left by the subtractions
+        threshold = self._update_scale * 1e-9
+
+        for (word_label, topic_label), count in counts.relation_counts.items():
+            word_relations = self._relations.get(word_label, {})
+            relation = word_relations.get(topic_label)
+            if relation:
+                relation.word_count -= count * scale
+                if relation.word_count <= threshold:
+                    del word_relations[topic_label]
+                    self._relations_view = None
+
+        for word_label, count in counts.word_counts.items():
+            word = self._words.get(word_label)
+            if word:
+                word.count -= count * scale
+                if word.count <= threshold or not self._relations.get(word_label):
+                    del self._words[word_label]
+                    self._relations.pop(word_label, None)
+                    self._words_view = None
+                    self._relations_view = None
+
+        self._publish(counts.word_counts)
+
+    def _rescale_counts(self):
+        scale = self._update_scale
+        for word in self._words.values():
+            word.count /= scale
+        for word_relations in self._relations.values():
+            for relation in word_relations.values():
+                relation.word_count /= scale
+        if self._update_window is not None:
+            self._update_history = deque((counts, counts_scale / scale)
+                                         for counts, counts_scale in self._update_history)
+        self._update_scale = 1
+
+    def _estimated_size(self):
+        """Estimate the memory used by the words, the relations and the posting lists
+
+        :return: int
+            Bytes, without the strings shared with other objects
+        """
+        size = sys.getsizeof(self._words) + sys.getsizeof(self._relations)
+        for word_label, word in self._words.items():
+            size += sys.getsizeof(word_label) + sys.getsizeof(word)
+        for word_relations in self._relations.values():
+            size += sys.getsizeof(word_relations)
+            size += sum(sys.getsizeof(relation) for relation in word_relations.values())
+
+        postings = self._snapshot.postings
+        size += sys.getsizeof(postings)
+        for word_postings in postings.values():
+            size += sum(sys.getsizeof(item) for item in word_postings) + sys.getsizeof(word_postings)
+
+        return size
+
+    def _compaction_state(self, sample):
+        state = {'words': len(self._words),
+                 'relations': sum(len(word_relations) for word_relations in self._relations.values()),
+                 'bytes': self._estimated_size()}
+        if sample:
+            start = time.perf_counter()
+            for sentences in sample:
+                self.predict(sentences, details=False)
+            state['predict_seconds'] = time.perf_counter() - start
+        return state
+
+    @_writer
+    def compact(self, min_count=None, max_vocabulary=None, top_n=None, max_uniformity=None, sample=None):
+        """Prune the rare and the uninformative words to get a smaller and faster model
+
+        The weights of the relations left are not changed, the words
+        without relations are deleted
+
+        :param min_count: float
+            Minimum number of occurrences of a word
+        :param max_vocabulary: int
+            Maximum number of words, the most frequent ones are kept
+        :param top_n: int
+            Maximum number of relations of a topic, the ones with the highest weight are kept
+        :param max_uniformity: float
+            Maximum uniformity of the weights of a word over all the topics,
+            from 0 (a single topic) to 1 (the same weight for all the topics)
+        :param sample: list
+            Sentences of predict timed before and after the compaction
+        :return: dict
+            The words, relations, estimated bytes and the predict_seconds
+            of the sample before and after the compaction
+        """
+        if max_vocabulary is not None and max_vocabulary < 0 or top_n is not None and top_n < 0:
+            raise ValueError('max_vocabulary and top_n must be positive int')
+
+        if sample:
+            # Fill the stem cache, the first run would be slower
+            self._compaction_state(sample)
+        before = self._compaction_state(sample)
+        scale = self._update_scale
+
+        removed = set()
+        if min_count is not None:
+            removed.update(word_label for word_label, word in self._words.items() if word.count / scale < min_count)
+
+        if max_uniformity is not None and len(self._topics) > 1:
+            max_entropy = math.log(len(self._topics))
+            for word_label, word_relations in self._relations.items():
+                entropy = 0
+                for relation in word_relations.values():
+                    weight = relation.weight
+                    if weight > 0:
+                        entropy -= weight * math.log(weight)
+                if entropy / max_entropy > max_uniformity:
+                    removed.add(word_label)
+
+        if max_vocabulary is not None:
+            words = [word for word_label, word in self._words.items() if word_label not in removed]
+            if len(words) > max_vocabulary:
+                removed.update(word.label for word in
+                               sorted(words, key=lambda w: w.count, reverse=True)[max_vocabulary:])
+
+        for word_label in removed:
+            del self._words[word_label]
+            self._relations.pop(word_label, None)
+
+        if top_n is not None:
+            topics_relations = {}
+            for word_relations in self._relations.values():
+                for relation in word_relations.values():
+                    topics_relations.setdefault(relation.topic.label, []).append(relation)
+            for topic_relations in topics_relations.values():
+                for relation in heapq.nsmallest(max(len(topic_relations) - top_n, 0), topic_relations,
+                                                key=lambda r: r.weight):
+                    del self._relations[relation.word.label][relation.topic.label]
+
+            for word_label in [word_label for word_label, word_relations in self._relations.items()
+                               if not word_relations]:
+                del self._words[word_label]
+                del self._relations[word_label]
+
+        if self._update_window is not None:
+            # The window must not remove the old counts from a word or relation added again later
+            for counts, _ in self._update_history:
+                for word_label in [word_label for word_label in counts.word_counts if word_label not in self._words]:
+                    del counts.word_counts[word_label]
+                for key in [key for key in counts.relation_counts if key[1] not in self._relations.get(key[0], ())]:
+                    del counts.relation_counts[key]
+
+        self._invalidate_views()
+        self._publish()
+
+        return {'before': before, 'after': self._compaction_state(sample)}
+
+    @_writer
+    def set_update_window(self, size):
+        """Keep only the counts of the last updates
+
+        When the window is full every update removes the counts of the
+        oldest update, the counts given by train are never removed
+
+        :param size: int
+            Number of updates kept, None disables the window
+        """
+        if size is not None and size < 1:
+            raise ValueError('size must be a positive int or None')
+
+        self._update_window = size
+        if size is None:
+            self._update_history = None
+        elif getattr(self, '_update_history', None) is None:
+            self._update_history = deque()
+
+    @_writer
+    def update(self, topics, examples, decay=None):
+        """Add an example to a trained model
+
+        Only the counts and posting lists of the example words are changed,
+        so the cost depends on the example length and not on the model size
+
+        If decay is given, the evidence seen so far is weighted by decay
+        before adding the example, e.g. decay=0.5 ** (elapsed / half_life)
+
+        :param topics: str or list of str
+        :param examples: str or list of str
+        :param decay: float
+            Value in (0, 1], the weight left to the previous counts
+        """
+        if decay is not None and not 0 < decay <= 1:
+            raise ValueError('decay must be in (0, 1]')
+
+        # Counted before the scale changes, invalid topics or examples leave the model untouched
+        counts = TrainingCounts()
+        counts.add(self._topics_list(topics), self._clean_examples(examples))
+
+        if decay is not None:
+            # The older counts are not touched, the new ones weigh 1 / decay more
+            self._update_scale /= decay
+            if self._update_scale > _MAX_UPDATE_SCALE:
+                self._rescale_counts()
+
+        self._apply_counts(counts)
+
+        if self._update_window is not None:
+            self._update_history.append((counts, self._update_scale))
+            while len(self._update_history) > self._update_window:
+                self._remove_counts(*self._update_history.popleft())
+
+    def train(self, topics=None, examples=None):
+        """Give examples of sentences related to a topic_label
+
+        An example can be a list of stems already cleaned, e.g. a sentence
+        of TextCleaner.clean_text, with the cleaner settings of the model
+
+        :param topics: str
+        :param examples: list
+        """
+        self.train_many([(topics, examples)])
+
+    @_writer
+    def train_many(self, corpus, processes=1, chunksize=256):
+        """Train the model with a whole labelled corpus in one pass
 
-        for word in cleaned_data:
-            for topic in topics_list:
-                self.add_word(word, topic)
+        The examples are cleaned one at a time while their counts are
+        aggregated, the model is updated once at the end
 
-        self._sort_data()
+        If processes is not 1 the examples are cleaned by a pool of
+        processes, None uses all the cpus
 
-    def _sort_data(self):
-        self.words = sorted(self.words, key=lambda o: o.label, reverse=False)
-        self.topics = sorted(self.topics, key=lambda o: o.label, reverse=False)
-        self.relations = sorted(self.relations, key=lambda o: o.word.label, reverse=False)
+        :param corpus: iterable of (topics, examples)
+            topics and examples accept the same values of train
+        :param processes: int
+        :param chunksize: int
+            Number of examples sent to a worker process in a single task
+        """
+        if self.stats is None:
+            self._apply_counts(self.count_corpus(corpus, processes, chunksize))
+            return
+
+        start = time.perf_counter()
+        counts = self.count_corpus(corpus, processes, chunksize)
+        counted = time.perf_counter()
+        self.stats.record('count', counted - start, counted_words=len(counts.word_counts),
+                          counted_relations=len(counts.relation_counts))
+        self._apply_counts(counts)
+        self.stats.record('apply_counts', time.perf_counter() - counted)
+
+    def count_corpus(self, corpus, processes=1, chunksize=256):
+        """Count a labelled corpus without changing the model
+
+        The counts of the shards of a corpus can be computed by many
+        extractors with the same cleaner settings, also on other machines,
+        and given to train_counts
+
+        :param corpus: iterable of (topics, examples)
+            topics and examples accept the same values of train
+        :param processes: int
+            Number of processes cleaning the examples, None uses all the cpus
+        :param chunksize: int
+            Number of examples sent to a worker process in a single task
+        :return: TrainingCounts
+        """
+        if processes == 1:
+            return self._count_corpus(corpus)
+        return parallel.count_corpus(self, corpus, processes, chunksize)
+
+    @_writer
+    def train_counts(self, counts):
+        """Train the model with the counts of a corpus
+
+        :param counts: TrainingCounts or list of TrainingCounts
+            The counts of a list are merged in order
+        """
+        if isinstance(counts, TrainingCounts):
+            counts = [counts]
+
+        merged = TrainingCounts()
+        for shard_counts in counts:
+            if not isinstance(shard_counts, TrainingCounts):
+                raise ValueError('counts must be a TrainingCounts or a list of TrainingCounts')
+            merged.merge(shard_counts)
+
+        self._apply_counts(merged)
+
+    def _count_corpus(self, corpus):
+        counts = TrainingCounts()
+
+        for topics, examples in corpus:
+            counts.add(self._topics_list(topics), self._clean_examples(examples))
+
+        return counts
 
-    def _execute_prediction(self, words, merge_topics):
+    def _execute_prediction(self, words, merge_topics, details=True, snapshot=None):
         topics = {}
+        if snapshot is None:
+            snapshot = self._snapshot
+        postings = snapshot.postings
 
         for data_word in words:
-            for relation in self.relations:
-                if relation.word.label == data_word:
-                    if relation.topic.label in topics.keys():
-                        # Add the weight of a existing topics - word relation to a Result
-                        topics[relation.topic.label].score += relation.weight
-                        topics[relation.topic.label].related_words.append(relation.word)
-                        topics[relation.topic.label].related_words_num += 1
-                        topics[relation.topic.label].topic_score += relation.weight
-                    else:
-                        # Create a new Result with the current topics
-                        result = Result(relation.topic)
-                        result.related_words.append(relation.word)
-                        result.related_words_num += 1
-                        result.score = relation.weight
-                        topics[relation.topic.label] = result
-                        topics[relation.topic.label].topic_score = relation.weight
+            word_postings = postings.get(data_word)
+            if word_postings is None:
+                continue
+            for relation, weight in zip(*word_postings):
+                result = topics.get(relation.topic.label)
+                if result is None:
+                    # Create a new Result with the current topics
+                    result = topics[relation.topic.label] = Result(relation.topic)
+                # Add the weight of the topics - word relation to the Result
+                result.score += weight
+                result.topic_score += weight
+                result.related_words_num += 1
+                if details:
+                    result.related_words.append(relation.word)
 
         if merge_topics:
-            topics = self.merge_topics(topics)
+            topics = self._merge_topics(topics, snapshot, details)
 
         return topics
 
-    def predict(self, sentences, merge_topics=True, sort_results=True):
+    def predict(self, sentences, merge_topics=True, sort_results=True, top_k=None, min_score=None, details=True):
         """Predict the topic_label of a list of words
 
         If merge_topics is true the output topics score will be merged based
@@ -478,45 +1232,395 @@ class TopicsExtractor:
 
         To define topics relations use set_related_topics method
 
+        A sentence can be a list of stems already cleaned, e.g. a sentence
+        of TextCleaner.clean_text, with the cleaner settings of the model
+
         :param sentences: list
         :param merge_topics: bool
         :param sort_results: bool
+        :param top_k: int
+            Maximum number of topics returned, the ones with the highest topic_score
+        :param min_score: float
+            Minimum topic_score of the returned topics
+        :param details: bool
+            If false the Results only hold the scores and the counts,
+            without the related_words and related_topics lists
         :return:
         """
 
+        if self.stats is not None:
+            return self._profiled_predict(sentences, merge_topics, sort_results, top_k, min_score, details)
+
+        cleaned_data = self._clean_sentences(sentences)
+
+        topics = self._execute_prediction(cleaned_data, merge_topics, details)
+
+        return self._select_results(topics, sort_results, top_k, min_score)
+
+    def _profiled_predict(self, sentences, merge_topics, sort_results, top_k, min_score, details):
+        stats = self.stats
+        snapshot = self._snapshot
+
+        start = time.perf_counter()
+        cleaned_data = self._clean_sentences(sentences)
+        cleaned = time.perf_counter()
+
+        topics = self._execute_prediction(cleaned_data, False, details, snapshot)
+        scored = time.perf_counter()
+
+        if merge_topics:
+            topics = self._merge_topics(topics, snapshot, details)
+        merged = time.perf_counter()
+
+        results = self._select_results(topics, sort_results, top_k, min_score)
+        selected = time.perf_counter()
+
+        postings = snapshot.postings
+        stats.record('clean', cleaned - start, words=len(cleaned_data))
+        stats.record('score', scored - cleaned, topics_matched=len(topics),
+                     relations_touched=sum(len(postings[word][0]) for word in cleaned_data if word in postings))
+        if merge_topics:
+            stats.record('merge_topics', merged - scored)
+        stats.record('select', selected - merged)
+        stats.record('predict', selected - start, predictions=1)
+
+        return results
+
+    def enable_stats(self, stats=None):
+        """Time and count the stages of the training and of the predictions
+
+        The same stats are used by the cleaner, they are not pickled
+
+        :param stats: PipelineStats
+            If None a new one is created
+        :return: PipelineStats
+        """
+        self.stats = stats if stats is not None else PipelineStats()
+        self.cleaner.stats = self.stats
+        return self.stats
+
+    def disable_stats(self):
+        self.stats = None
+        self.cleaner.stats = None
+
+    @staticmethod
+    def _text_chunks(source, chunk_size):
+        if isinstance(source, str):
+            return [source]
+        if hasattr(source, 'read'):
+            return iter(functools.partial(source.read, chunk_size), '')
+        return source
+
+    def predict_stream(self, source, merge_topics=True, sort_results=True, top_k=None, min_score=None,
+                       details=False, chunk_size=65536):
+        """Predict the topics of a text read in chunks
+
+        The text is cleaned and scored one sentence at a time and is never
+        held in memory, the scores are the ones of predict on the whole text
+
+        :param source: str, text file object or iterable of str
+        :param merge_topics: bool
+        :param sort_results: bool
+        :param top_k: int
+        :param min_score: float
+        :param details: bool
+            If true the Results hold the related_words list, which grows
+            with the length of the text
+        :param chunk_size: int
+            Number of characters read at once from a file object
+        :return: the output of predict
+        """
+        sentences = self.cleaner.stem_stream(self._text_chunks(source, chunk_size))
+        words = (word for sentence in sentences for word in sentence)
+
+        topics = self._execute_prediction(words, merge_topics, details)
+
+        return self._select_results(topics, sort_results, top_k, min_score)
+
+    def predict_windows(self, source, window=10, step=None, merge_topics=True, sort_results=True, top_k=None,
+                        min_score=None, chunk_size=65536):
+        """Predict the topics of the rolling windows of sentences of a text read in chunks
+
+        Only the sentences of the current window are held in memory, the
+        last window is shorter if the sentences don't fill it
+
+        :param source: str, text file object or iterable of str
+        :param window: int
+            Number of sentences of a window
+        :param step: int
+            Number of sentences between the starts of two windows,
+            None gives windows without overlap
+        :param merge_topics: bool
+        :param sort_results: bool
+        :param top_k: int
+        :param min_score: float
+        :param chunk_size: int
+            Number of characters read at once from a file object
+        :return: generator of (index of the first sentence, output of predict without details)
+        """
+        step = window if step is None else step
+        if window < 1 or step < 1:
+            raise ValueError('window and step must be positive int')
+
+        # Checked before the generator starts, not at the first window
+        return self._predict_windows(source, window, step, merge_topics, sort_results, top_k, min_score, chunk_size)
+
+    def _predict_windows(self, source, window, step, merge_topics, sort_results, top_k, min_score, chunk_size):
+        def predict_window(start, sentences):
+            words = [word for sentence in sentences for word in sentence]
+            topics = self._execute_prediction(words, merge_topics, details=False)
+            return start, self._select_results(topics, sort_results, top_k, min_score)
+
+        sentences = deque(maxlen=window)
+        next_start = 0
+        index = covered = -1
+        for index, sentence in enumerate(self.cleaner.stem_stream(self._text_chunks(source, chunk_size))):
+            sentences.append(sentence)
+            if index - window + 1 == next_start:
+                yield predict_window(next_start, sentences)
+                next_start += step
+                covered = index
+
+        if covered < index and next_start <= index:
+            yield predict_window(next_start, list(sentences)[next_start - index - 1:])
+
+    def predict_segments(self, sentences, segment_size=1, merge_topics=True):
+        """Score every segment of consecutive sentences of a text
+
+        The text is cleaned once, a segment gets the topic_score of predict
+        on its sentences, 0 for the topics without related words
+
+        :param sentences: list
+            The same values of the sentences of predict
+        :param segment_size: int
+            Number of sentences of a segment, the last one can be shorter
+        :param merge_topics: bool
+        :return: tuple (topic labels, list of array of float)
+            For every segment an array with the score of every topic,
+            in the order of the labels
+        """
+        if segment_size < 1:
+            raise ValueError('segment_size must be a positive int')
+
+        sentences_stems = self._stem_sentences(sentences)
+
+        snapshot = self._snapshot
+        postings = snapshot.postings
+        topic_labels = [topic.label for topic in snapshot.topics]
+        topics_index = {label: index for index, label in enumerate(topic_labels)}
+        related = snapshot.related.indexed(topic_labels)
+        zeros = bytes(array('d').itemsize * len(topic_labels))
+
+        segments = []
+        for start in range(0, len(sentences_stems), segment_size):
+            scores = array('d', zeros)
+            matched = {}
+            for sentence in sentences_stems[start:start + segment_size]:
+                for data_word in sentence:
+                    word_postings = postings.get(data_word)
+                    if word_postings is None:
+                        continue
+                    for relation, weight in zip(*word_postings):
+                        topic_index = topics_index[relation.topic.label]
+                        scores[topic_index] += weight
+                        matched[topic_index] = None
+
+            if merge_topics:
+                topic_scores = array('d', scores)
+                for topic_index in matched:
+                    for coexist, related_index in related[topic_index]:
+                        if related_index not in matched:
+                            continue
+                        if coexist:
+                            topic_scores[topic_index] += scores[related_index]
+                        else:
+                            topic_scores[topic_index] -= scores[related_index]
+                scores = topic_scores
+
+            segments.append(scores)
+
+        return topic_labels, segments
+
+    def predict_many(self, documents, processes=None, chunksize=64, merge_topics=True, sort_results=True):
+        """Predict the topics of many documents with a pool of processes
+
+        The workers are forked with the model already loaded, results keep
+        the order of the documents
+
+        :param documents: iterable, every document accepts the sentences of predict
+        :param processes: int
+            Number of worker processes, None uses all the cpus
+        :param chunksize: int
+            Number of documents sent to a worker in a single task
+        :param merge_topics: bool
+        :param sort_results: bool
+        :return: list with the output of predict for every document
+        """
+        return list(parallel.predict_many(self, documents, processes, chunksize, merge_topics, sort_results))
+
+    def _prediction_call(self, executor, sentences, merge_topics, sort_results):
+        if executor is not None and parallel.is_model_executor(executor):
+            return functools.partial(parallel._predict_document, sentences, merge_topics, sort_results)
+        return functools.partial(self.predict, sentences, merge_topics, sort_results)
+
+    async def apredict(self, sentences, merge_topics=True, sort_results=True, executor=None):
+        """Predict the topics without blocking the asyncio event loop
+
+        The prediction runs on the executor, None uses the default thread
+        pool of the loop, use parallel.model_executor for a process pool
+
+        :param sentences: list
+        :param merge_topics: bool
+        :param sort_results: bool
+        :param executor: concurrent.futures.Executor
+        :return: the output of predict
+        """
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor,
+                                          self._prediction_call(executor, sentences, merge_topics, sort_results))
+
+    async def apredict_many(self, documents, concurrency=8, merge_topics=True, sort_results=True, executor=None):
+        """Predict the topics of a stream of documents on an executor
+
+        At most concurrency documents are read from the source and not yet
+        consumed, so a slow consumer slows down the reading of the source
+
+        :param documents: async iterable or iterable
+            Every document accepts the sentences of predict
+        :param concurrency: int
+            Maximum number of predictions running or waiting to be consumed
+        :param merge_topics: bool
+        :param sort_results: bool
+        :param executor: concurrent.futures.Executor
+            None uses the default thread pool of the loop,
+            use parallel.model_executor for a process pool
+        :return: async generator of (document index, predict output),
+            in order of completion
+        """
+        if concurrency < 1:
+            raise ValueError('concurrency must be a positive int')
+
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        slots = asyncio.Semaphore(concurrency)
+        completed = asyncio.Queue()
+
+        def submit(index, document):
+            future = loop.run_in_executor(executor,
+                                          self._prediction_call(executor, document, merge_topics, sort_results))
+            future.add_done_callback(lambda done: completed.put_nowait((index, done)))
+
+        async def produce():
+            index = 0
+            try:
+                if hasattr(documents, '__aiter__'):
+                    async for document in documents:
+                        await slots.acquire()
+                        submit(index, document)
+                        index += 1
+                else:
+                    for document in documents:
+                        await slots.acquire()
+                        submit(index, document)
+                        index += 1
+            finally:
+                # The end of the documents, with their number
+                completed.put_nowait((None, index))
+
+        producer = asyncio.ensure_future(produce())
+        received = 0
+        total = None
+        try:
+            while total is None or received < total:
+                index, item = await completed.get()
+                if index is None:
+                    total = item
+                    await producer
+                    continue
+                received += 1
+                slots.release()
+                yield index, item.result()
+        finally:
+            producer.cancel()
+
+    def _stem_sentences(self, sentences):
         if not isinstance(sentences, str) and not isinstance(sentences, list):
             raise ValueError('Invalid sentences must be a str or a list of str')
 
+        if isinstance(sentences, str):
+            sentences = [sentences]
+
+        sentences_stems = []
+        for sentence in sentences:
+            stems = _as_stems(sentence)
+            if stems is not None:
+                sentences_stems.append(stems)
+                continue
+            if not isinstance(sentence, str):
+                raise ValueError('Invalid sentence in list of examples, must be a str or a list of stems')
+            sentences_stems.extend(self.cleaner.clean_text(sentence))
+
+        return sentences_stems
+
+    def _clean_sentences(self, sentences):
         cleaned_data = []
+        for data_sentence in self._stem_sentences(sentences):
+            cleaned_data.extend(data_sentence)
 
-        if isinstance(sentences, str):
-            for data_sentence in self.cleaner.clean_text(sentences):
-                for data in data_sentence:
-                    cleaned_data.append(data)
-        else:
-            for sentence in sentences:
-                if not isinstance(sentence, str):
-                    raise ValueError('Invalid sentence in list of examples, must be a str')
-                for data_sentence in self.cleaner.clean_text(sentence):
-                    for data in data_sentence:
-                        cleaned_data.append(data)
+        return cleaned_data
 
-        topics = self._execute_prediction(cleaned_data, merge_topics)
+    def compile(self):
+        """Get an array based copy of the model used by predict_batch
 
-        if sort_results:
-            topics_list = []
-            for topic in topics:
-                topics_list.append(topics[topic])
-            return sorted(topics_list, key=lambda t: t.topic_score, reverse=True)
-        return topics
+        The compiled model is built once for every published snapshot,
+        numpy is required
+
+        :return: CompiledModel
+        """
+        return self._snapshot.compile()
+
+    def predict_batch(self, texts, merge_topics=True, sort_results=True, top_k=None, min_score=None,
+                      details=True):
+        """Predict the topics of many documents with a vectorized scoring
+
+        Every document accepts the same values of the sentences of predict
+        and gets the same scores, the Results don't hold the related_words
+        list but only its count
 
-    def save(self, path=None, filename=None):
+        :param texts: list
+        :param merge_topics: bool
+        :param sort_results: bool
+        :param top_k: int
+        :param min_score: float
+        :param details: bool
+            If false the Results don't hold the related_topics list
+        :return: list with the output of predict for every document
+        """
+        if not isinstance(texts, list):
+            raise ValueError('Invalid texts must be a list')
+
+        documents = [self._clean_sentences(text) for text in texts]
+        return _compiled_predictions(self.compile(), documents, merge_topics, sort_results, top_k, min_score, details)
+
+    def save(self, path=None, filename=None, file_format='tpsx'):
         """Save the current model
 
+        The tpsx format is a versioned columnar file that can be memory
+        mapped, see MappedModel, the pickle format dumps the
+        whole object
+
         :param path:
         :param filename:
+        :param file_format: str
+            'tpsx' or 'pickle'
         :return:
         """
+        if file_format not in ('tpsx', 'pickle'):
+            raise ValueError(f'Invalid file_format: {file_format}')
+
         if not path:
             path = '/'
 
@@ -524,11 +1628,15 @@ class TopicsExtractor:
             os.mkdir(path)
 
         if not filename:
-            filename = f'{datetime.datetime.now().strftime("%y%m%d%H%M%S")}-db.pickle'
+            filename = f'{datetime.datetime.now().strftime("%y%m%d%H%M%S")}-db.{file_format}'
 
         try:
-            with open(os.path.join(path, filename), 'wb') as file:
-                pickle.dump(obj=self, file=file)
+            # Training threads wait, the file holds a consistent model
+            with open(os.path.join(path, filename), 'wb') as file, self._lock:
+                if file_format == 'pickle':
+                    pickle.dump(obj=self, file=file)
+                else:
+                    write_model(self, file)
                 return 0
         except:
             return 1
@@ -543,5 +1651,122 @@ class TopicsExtractor:
 
         if not os.path.exists(file_path):
             raise FileNotFoundError()
+
+        if is_model_file(file_path):
+            return cls._from_model_file(ModelFile(file_path))
+
         with open(file_path, 'rb') as file:
             return pickle.load(file)
+
+    @classmethod
+    def _from_model_file(cls, model_file):
+        header = model_file.header
+        extractor = cls(header['language'], **header['cleaner'])
+
+        topics = []
+        for topic_label in header['topics']:
+            extractor.add_topic(topic_label)
+            topics.append(extractor._topics[topic_label])
+
+        words = []
+        for word_label, count in zip(model_file.words, model_file.word_counts):
+            word = Word(word_label)
+            word.count = _stored_count(count)
+            extractor._words[word_label] = word
+            words.append(word)
+
+        for word_index, topic_index, count in zip(model_file.relation_words,
+                                                  model_file.relation_topics,
+                                                  model_file.relation_counts):
+            word = words[word_index]
+            relation = Relation(topics[topic_index], word)
+            relation.word_count = _stored_count(count)
+            extractor._relations.setdefault(word.label, {})[relation.topic.label] = relation
+
+        for topic1, topic2, coexist, bidirectional in header['related_topics']:
+            extractor.related_topics.append(RelatedTopic(topic1, topic2, coexist, bidirectional))
+        extractor._index_related_topics()
+
+        extractor._invalidate_views()
+        extractor._publish()
+        return extractor
+
+
+class MappedModel:
+    """
+    This class is used to predict with a model saved in the tpsx format
+    without loading its objects
+
+    The arrays of the compiled model are views of the memory mapped file,
+    shared by all the processes mapping it, and the words are decoded when
+    they are looked up, so a model is ready in milliseconds. The outputs
+    are the ones of TopicsExtractor.predict_batch, numpy is required
+
+    Variables
+    ----------
+    file_path: str
+    language: str
+    cleaner: TextCleaner
+    model_file: ModelFile
+    compiled: CompiledModel
+    """
+
+    def __init__(self, file_path):
+        """
+        :param file_path: str
+            A model saved with the tpsx file_format
+        """
+        self.file_path = file_path
+        self.model_file = ModelFile(file_path)
+        header = self.model_file.header
+        self.language = header['language']
+        self.cleaner = TextCleaner(header['language'], **header['cleaner'])
+        self.compiled = CompiledModel.from_file(self.model_file)
+
+    def __reduce__(self):
+        # A mapping can't be pickled, the file is mapped again
+        return self.__class__, (self.file_path,)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    _stem_sentences = TopicsExtractor._stem_sentences
+    _clean_sentences = TopicsExtractor._clean_sentences
+
+    def predict(self, sentences, merge_topics=True, sort_results=True, top_k=None, min_score=None, details=True):
+        """Predict the topics of a text, see TopicsExtractor.predict_batch
+
+        :param sentences: list
+        :param merge_topics: bool
+        :param sort_results: bool
+        :param top_k: int
+        :param min_score: float
+        :param details: bool
+        :return: the output of predict
+        """
+        return self.predict_batch([sentences], merge_topics, sort_results, top_k, min_score, details)[0]
+
+    def predict_batch(self, texts, merge_topics=True, sort_results=True, top_k=None, min_score=None,
+                      details=True):
+        """Predict the topics of many documents, see TopicsExtractor.predict_batch
+
+        :param texts: list
+        :param merge_topics: bool
+        :param sort_results: bool
+        :param top_k: int
+        :param min_score: float
+        :param details: bool
+        :return: list with the output of predict for every document
+        """
+        if not isinstance(texts, list):
+            raise ValueError('Invalid texts must be a list')
+
+        documents = [self._clean_sentences(text) for text in texts]
+        return _compiled_predictions(self.compiled, documents, merge_topics, sort_results, top_k, min_score, details)
+
+    def close(self):
+        self.compiled = None
+        self.model_file.close()